@@ -1,11 +1,15 @@
+import json
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+from src.cache import RAG_ANSWER_CACHE_COLLECTION, FAQ_COLLECTION
+from src.embeddings import get_embeddings
+from src.agents import RAG_COLLECTION_METADATA
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -30,9 +34,35 @@ doc_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
 doc_chunks = doc_splitter.split_documents(docs)
 
 print("Creating vector embeddings...")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+embeddings = get_embeddings()
 
-vectorstore = Chroma.from_documents(doc_chunks, embeddings, persist_directory="db")
+# Rebuild the collection from scratch, the embedding size may have changed
+Chroma(persist_directory="db").delete_collection()
+vectorstore = Chroma.from_documents(
+    doc_chunks,
+    embeddings,
+    persist_directory="db",
+    collection_metadata=RAG_COLLECTION_METADATA
+)
+
+print("Indexing FAQ...")
+with open("./data/faq.json", encoding="utf-8") as faq_file:
+    faq_entries = json.load(faq_file)
+Chroma(collection_name=FAQ_COLLECTION, persist_directory="db").delete_collection()
+faq_store = Chroma(
+    collection_name=FAQ_COLLECTION,
+    embedding_function=embeddings,
+    persist_directory="db",
+    collection_metadata={"hnsw:space": "cosine"}
+)
+faq_store.add_texts(
+    [entry["question"] for entry in faq_entries],
+    metadatas=[{"answer": entry["answer"]} for entry in faq_entries]
+)
+
+# Cached RAG answers were generated from the previous knowledge base, drop them
+print("Clearing RAG answer cache...")
+Chroma(collection_name=RAG_ANSWER_CACHE_COLLECTION, persist_directory="db").delete_collection()
 
 # Semantic vector search
 vectorstore_retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
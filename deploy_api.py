@@ -26,7 +26,7 @@ app.add_middleware(
 )
 
 def get_runnable():
-    return  Workflow().app
+    return Workflow.get().app
 
 # Fetch LangGraph Automation runnable which generates the workouts
 runnable = get_runnable()
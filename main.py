@@ -1,14 +1,19 @@
+import sys
+import asyncio
 from colorama import Fore, Style
 from src.graph import Workflow
+from src.logger import get_logger
 from dotenv import load_dotenv
 
 # Load all env variables
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # config 
 config = {'recursion_limit': 100}
 
-workflow = Workflow()
+workflow = Workflow.get()
 app = workflow.app
 
 initial_state = {
@@ -26,15 +31,43 @@ initial_state = {
     "generated_email": "",
     "rag_queries": [],
     "retrieved_documents": "",
+    "needs_human_attention": False,
     "writer_messages": [],
     "sendable": False,
     "trials": 0
 }
 
 # Run the automation
-print(Fore.GREEN + "Starting workflow..." + Style.RESET_ALL)
-for output in app.stream(initial_state, config):
-    for key, value in output.items():
-        print(Fore.CYAN + f"Finished running: {key}:" + Style.RESET_ALL)
+async def run_workflow():
+    print(Fore.GREEN + "Starting workflow..." + Style.RESET_ALL)
+    # Some nodes are async (e.g. concurrent RAG retrieval), so stream asynchronously
+    async for output in app.astream(initial_state, config):
+        for key, value in output.items():
+            print(Fore.CYAN + f"Finished running: {key}:" + Style.RESET_ALL)
+
+
+async def watch():
+    # Keep running, processing the inbox again whenever new emails arrive (IMAP IDLE),
+    # all in a single event loop so the async clients of the nodes keep working
+    email_tools = workflow.nodes.email_tools
+    # Watch from before the first run, emails arriving during it are reported by the first wait
+    try:
+        await asyncio.to_thread(email_tools.start_watching)
+    except Exception:
+        # The first wait connects again
+        logger.exception("Could not open the IDLE connection")
+    while True:
+        try:
+            await run_workflow()
+        except Exception:
+            # Keep watching, the emails left unread are fetched again by the next run
+            logger.exception("Workflow run failed")
+        # A wait that times out is a poll too: it picks up the emails left for later
+        # (beyond max_results or failed) even if no new email arrives
+        await asyncio.to_thread(email_tools.wait_for_new_emails)
 
 
+if "--watch" in sys.argv:
+    asyncio.run(watch())
+else:
+    asyncio.run(run_workflow())
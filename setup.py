@@ -13,8 +13,10 @@ setup(
         "langchain_chroma",
         "chromadb",
         "beautifulsoup4",
+        "selectolax",
         "python-dotenv",
         "colorama",
+        "opentelemetry-api",
         "langserve",
         "sse_starlette",
         "uvicorn",
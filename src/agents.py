@@ -1,13 +1,31 @@
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_chroma import Chroma
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.globals import set_llm_cache
+from .cache import SemanticCache, ValidatedLLMCache, FAQ_COLLECTION
+from .embeddings import get_embeddings
 from .structure_outputs import *
 from .prompts import *
 
+# HNSW index settings of the RAG collection, only applied when the collection is
+# (re)built with create_index.py
+RAG_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 64,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 128,
+}
+
+# Exact-match cache for identical LLM prompts (e.g. re-categorizing the same email),
+# shared by every Agents instance of the process
+LLM_CACHE_SIZE = 1024
+set_llm_cache(ValidatedLLMCache(
+    (CategorizeEmailOutput, RAGQueriesOutput, WriterOutput, ProofReaderOutput),
+    maxsize=LLM_CACHE_SIZE
+))
+
 class Agents():
     def __init__(self):
         # Choose which LLMs to use for each agent (GPT-4o, Gemini, LLAMA3,...)
@@ -15,59 +33,49 @@ class Agents():
         gemini = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.1)
         
         # QA assistant chat
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-        vectorstore = Chroma(persist_directory="db", embedding_function=embeddings)
+        embeddings = get_embeddings()
+        vectorstore = Chroma(
+            persist_directory="db",
+            embedding_function=embeddings,
+            collection_metadata=RAG_COLLECTION_METADATA
+        )
         retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
 
+        # Semantic cache of RAG answers, shares the embeddings of the RAG store
+        self.rag_answer_cache = SemanticCache(embeddings)
+
+        # Curated FAQ answers, matched against the whole email body
+        self.faq = SemanticCache(embeddings, collection_name=FAQ_COLLECTION, max_distance=0.12)
+
         # Categorize email chain
-        email_category_prompt = PromptTemplate(
-            template=CATEGORIZE_EMAIL_PROMPT, 
-            input_variables=["email"]
-        )
         self.categorize_email = (
-            email_category_prompt | 
+            CATEGORIZE_EMAIL_TEMPLATE | 
             llama.with_structured_output(CategorizeEmailOutput)
         )
 
         # Used to design queries for RAG retrieval
-        generate_query_prompt = PromptTemplate(
-            template=GENERATE_RAG_QUERIES_PROMPT, 
-            input_variables=["email"]
-        )
         self.design_rag_queries = (
-            generate_query_prompt | 
+            GENERATE_RAG_QUERIES_TEMPLATE | 
             llama.with_structured_output(RAGQueriesOutput)
         )
         
         # Generate answer to queries using RAG
-        qa_prompt = ChatPromptTemplate.from_template(GENERATE_RAG_ANSWER_PROMPT)
         self.generate_rag_answer = (
             {"context": retriever, "question": RunnablePassthrough()}
-            | qa_prompt
+            | GENERATE_RAG_ANSWER_TEMPLATE
             | llama
             | StrOutputParser()
         )
         
 
         # Used to write a draft email based on category and related informations
-        writer_prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", EMAIL_WRITER_PROMPT),
-                MessagesPlaceholder("history"),
-                ("human", "{email_information}")
-            ]
-        )
         self.email_writer = (
-            writer_prompt | 
+            EMAIL_WRITER_TEMPLATE | 
             llama.with_structured_output(WriterOutput)
         )
 
         # Verify the generated email
-        proofreader_prompt = PromptTemplate(
-            template=EMAIL_PROOFREADER_PROMPT, 
-            input_variables=["initial_email", "generated_email"]
-        )
         self.email_proofreader = (
-            proofreader_prompt | 
+            EMAIL_PROOFREADER_TEMPLATE | 
             llama.with_structured_output(ProofReaderOutput) 
         )
\ No newline at end of file
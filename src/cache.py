@@ -0,0 +1,98 @@
+"""
+RAG Answer Cache Module
+=======================
+
+This module provides a semantic cache for the answers produced by the RAG chain
+(see agents.py). Customer emails tend to ask the same questions with slightly
+different wording, so answers are stored in a dedicated Chroma collection keyed
+by the embedding of the query that produced them.
+
+A lookup embeds the incoming query and returns the stored answer of the nearest
+cached query when their cosine distance is below the configured threshold,
+skipping the retrieval and LLM calls entirely.
+
+The same lookup backs the FAQ fast path: curated question/answer pairs from
+data/faq.json are indexed in their own collection by create_index.py.
+
+It also provides the exact-match cache of LLM calls, which leaves out the
+structured answers that don't validate so a retry asks the LLM again.
+"""
+
+import time
+from typing import Iterable, Optional, Type
+from pydantic import BaseModel, ValidationError
+from langchain_chroma import Chroma
+from langchain_core.caches import InMemoryCache, RETURN_VAL_TYPE
+from langchain_core.embeddings import Embeddings
+
+RAG_ANSWER_CACHE_COLLECTION = "rag_answer_cache"
+FAQ_COLLECTION = "faq"
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        persist_directory: str = "db",
+        collection_name: str = RAG_ANSWER_CACHE_COLLECTION,
+        max_distance: float = 0.05,
+    ):
+        """
+        Args:
+            embeddings: Embedding function, the same one used by the RAG vector store
+            persist_directory: Directory where the Chroma database is stored
+            collection_name: Name of the Chroma collection holding cached answers
+            max_distance: Maximum cosine distance (1 - similarity) to count as a hit
+        """
+        self.max_distance = max_distance
+        self.store = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+
+    async def alookup(self, query: str) -> Optional[str]:
+        """Returns the cached answer of the most similar query, or None on a miss."""
+        matches = await self.store.asimilarity_search_with_score(query, k=1)
+        if matches:
+            document, distance = matches[0]
+            if distance <= self.max_distance:
+                return document.metadata["answer"]
+        return None
+
+    async def aupdate(self, query: str, answer: str) -> None:
+        """Stores the answer generated for a query."""
+        await self.store.aadd_texts(
+            [query],
+            metadatas=[{"answer": answer, "ts": time.time()}],
+        )
+
+
+class ValidatedLLMCache(InMemoryCache):
+    def __init__(self, schemas: Iterable[Type[BaseModel]], maxsize: Optional[int] = None):
+        """
+        Args:
+            schemas: Structured output models, their tool calls must validate to be cached
+            maxsize: Maximum number of cached calls, the oldest ones are dropped first
+        """
+        super().__init__(maxsize=maxsize)
+        self._schemas = {schema.__name__: schema for schema in schemas}
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Caches the answer of an LLM call, unless its output fails validation."""
+        for generation in return_val:
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            if getattr(message, "invalid_tool_calls", None):
+                return
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                schema = self._schemas.get(tool_call["name"])
+                if schema is None:
+                    continue
+                try:
+                    schema.model_validate(tool_call["args"])
+                except ValidationError:
+                    return
+        super().update(prompt, llm_string, return_val)
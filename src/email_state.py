@@ -0,0 +1,80 @@
+"""
+Email State Module
+==================
+
+This module persists what the email tools already know about the mailbox between
+polls, so each poll only asks the IMAP server for what changed.
+
+For every folder it records the UIDVALIDITY and the highest UID already fetched:
+while UIDVALIDITY is unchanged UIDs are never reused, new messages are exactly
+those above the stored UID, and a poll finding UIDNEXT unchanged needs no SEARCH
+or FETCH at all. It also records the threads that have a draft reply, which
+stands in for the drafts folder when it can't be read.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+EMAIL_STATE_PATH = "db/email_state.sqlite"
+
+
+class EmailStateStore:
+    def __init__(self, path: str = EMAIL_STATE_PATH):
+        """
+        Args:
+            path: Path of the SQLite database, ":memory:" keeps the state in-process only
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS mailbox_state (name TEXT PRIMARY KEY, uidvalidity INTEGER, last_uid INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, has_draft INTEGER, last_seen REAL)"
+        )
+        self._db.commit()
+
+    def get_mailbox(self, name: str) -> Optional[Tuple[int, int]]:
+        """Returns the stored (UIDVALIDITY, last fetched UID) of a folder, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uidvalidity, last_uid FROM mailbox_state WHERE name = ?", (name,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_mailbox(self, name: str, uidvalidity: int, last_uid: int) -> None:
+        """Stores the UIDVALIDITY and the last fetched UID of a folder."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mailbox_state (name, uidvalidity, last_uid) VALUES (?, ?, ?)",
+                (name, uidvalidity, last_uid)
+            )
+            self._db.commit()
+
+    def set_draft_threads(self, thread_ids: Iterable[str]) -> None:
+        """Records the threads having a draft reply, replacing the previous set."""
+        with self._lock:
+            self._db.execute("UPDATE threads SET has_draft = 0")
+            self._add_draft_threads(thread_ids)
+
+    def add_draft_threads(self, thread_ids: Iterable[str]) -> None:
+        """Records new draft replies, keeping the threads already recorded."""
+        with self._lock:
+            self._add_draft_threads(thread_ids)
+
+    def _add_draft_threads(self, thread_ids: Iterable[str]) -> None:
+        now = time.time()
+        self._db.executemany(
+            "INSERT INTO threads (thread_id, has_draft, last_seen) VALUES (?, 1, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET has_draft = 1, last_seen = excluded.last_seen",
+            [(thread_id, now) for thread_id in thread_ids]
+        )
+        self._db.commit()
+
+    def draft_threads(self) -> Set[str]:
+        """Returns the threads recorded as having a draft reply."""
+        with self._lock:
+            rows = self._db.execute("SELECT thread_id FROM threads WHERE has_draft = 1").fetchall()
+        return {row[0] for row in rows}
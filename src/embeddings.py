@@ -0,0 +1,105 @@
+"""
+Cached Embeddings Module
+========================
+
+This module wraps the embedding model used by the RAG vector store and the RAG
+answer cache so identical texts are only embedded once.
+
+Queries sent to the vector stores are generated by the LLM from similar customer
+emails and repeat often, while every embedding call is a network round-trip.
+CachedEmbeddings keeps recent vectors in an in-process LRU cache and persists all
+of them in a small SQLite database keyed by the hash of the text (queries are
+normalized first), so the cache survives restarts.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+from array import array
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_CACHE_PATH = "db/embedding_cache.sqlite"
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, cache_path: str = EMBEDDING_CACHE_PATH, maxsize: int = 10000):
+        """
+        Args:
+            embeddings: Underlying embedding model
+            cache_path: Path of the SQLite database persisting the vectors
+            maxsize: Maximum number of vectors kept in the in-process LRU cache
+        """
+        self.embeddings = embeddings
+        # Vectors of different models or sizes are not interchangeable
+        self._namespace = "{}:{}".format(
+            getattr(embeddings, "model", type(embeddings).__name__),
+            getattr(embeddings, "output_dimensionality", None)
+        )
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._db.commit()
+        self._cached_embed_query = lru_cache(maxsize=maxsize)(self._embed_query)
+
+    def _key(self, kind: str, text: str) -> str:
+        """Builds the cache key of a query or document text."""
+        return hashlib.md5(f"{self._namespace}:{kind}:{text}".encode()).hexdigest()
+
+    def _load(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return array("d", row[0]).tolist() if row else None
+
+    def _store(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, array("d", vector).tobytes())
+            )
+            self._db.commit()
+
+    def _embed_query(self, normalized_text: str) -> Tuple[float, ...]:
+        key = self._key("query", normalized_text)
+        vector = self._load(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(normalized_text)
+            self._store(key, vector)
+        return tuple(vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a query, reusing the cached vector of an identical normalized text."""
+        return list(self._cached_embed_query(text.strip().lower()))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds documents, sending only the texts missing from the cache to the model."""
+        keys = [self._key("document", text) for text in texts]
+        vectors = [self._load(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                self._store(keys[i], vector)
+                vectors[i] = vector
+        return vectors
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Builds the cached embedding model shared by the RAG store and its caches.
+
+    The EMBEDDING_DIMENSIONS environment variable truncates the vectors (e.g. 256
+    instead of the native 768), which shrinks the vector store and speeds up
+    similarity search at a small recall cost. Changing it requires rebuilding
+    the index with create_index.py.
+    """
+    dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        output_dimensionality=int(dimensions) if dimensions else None
+    ))
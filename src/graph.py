@@ -14,8 +14,10 @@ The Workflow class builds a state machine that:
 
 Core workflow capabilities:
 - Loading and checking new emails from the inbox
-- Categorizing emails into different types (product inquiries, feedback, spam, etc.)
-- Retrieving relevant information from knowledge base using RAG for product inquiries
+- Categorizing all loaded emails in one batch (product inquiries, feedback, spam, etc.)
+  while designing their RAG queries concurrently
+- Answering common product inquiries from a curated FAQ, otherwise retrieving
+  relevant information from knowledge base using RAG
 - Generating appropriate responses with AI assistance
 - Quality control through proofreading and revision cycles
 - Creating drafts or sending emails based on configuration
@@ -29,23 +31,24 @@ from langgraph.graph import END, StateGraph
 from .state import GraphState
 from .nodes import Nodes
 import os
-import logging
+from functools import lru_cache
+from typing import Optional
+from .logger import get_logger
+from .tracing import traced
 
 # Configure logging
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = get_logger(__name__)
 
-# Add console handler if no handlers exist
-if not logger.handlers:
-    console_handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+def human_interaction_from_env() -> bool:
+    """Reads the HUMAN_INTERACTION environment setting."""
+    return os.getenv("HUMAN_INTERACTION", "False").lower() in ("true", "1", "t")
 
 class Workflow():
-    def __init__(self):
+    def __init__(self, human_interaction: Optional[bool] = None):
         # Check environment configuration for email handling
-        human_interaction = os.getenv("HUMAN_INTERACTION", "False").lower() in ("true", "1", "t")
+        if human_interaction is None:
+            human_interaction = human_interaction_from_env()
+        self.human_interaction = human_interaction
         
         if human_interaction:
             logger.info("🧑‍💼 HUMAN_INTERACTION=True: Creating drafts for human review before sending")
@@ -61,48 +64,63 @@ class Workflow():
         workflow = StateGraph(GraphState)
         nodes = Nodes()
 
+        def add_node(name, action):
+            # each node runs in its own tracing span
+            workflow.add_node(name, traced(name, action))
+
         # define all graph nodes
-        workflow.add_node("load_inbox_emails", nodes.load_new_emails)
-        workflow.add_node("is_email_inbox_empty", nodes.is_email_inbox_empty)
-        workflow.add_node("categorize_email", nodes.categorize_email)
-        workflow.add_node("construct_rag_queries", nodes.construct_rag_queries)
-        workflow.add_node("retrieve_from_rag", nodes.retrieve_from_rag)
-        workflow.add_node("email_writer", nodes.write_draft_email)
-        workflow.add_node("email_proofreader", nodes.verify_generated_email)
-        workflow.add_node("create_draft", nodes.create_draft_response)
-        workflow.add_node("send_email", nodes.send_email_response)
-        workflow.add_node("skip_unrelated_email", nodes.skip_unrelated_email)
-        workflow.add_node("mark_for_human_attention", nodes.mark_for_human_attention)
-        workflow.add_node("skip_spam_email", nodes.skip_spam_email)
+        add_node("load_inbox_emails", nodes.load_new_emails)
+        add_node("analyze_emails", nodes.analyze_emails)
+        add_node("is_email_inbox_empty", nodes.is_email_inbox_empty)
+        add_node("select_next_email", nodes.select_next_email)
+        add_node("match_faq", nodes.match_faq)
+        add_node("retrieve_from_rag", nodes.retrieve_from_rag)
+        add_node("email_writer", nodes.write_draft_email)
+        add_node("email_proofreader", nodes.verify_generated_email)
+        add_node("create_draft", nodes.create_draft_response)
+        add_node("send_email", nodes.send_email_response)
+        add_node("skip_unrelated_email", nodes.skip_unrelated_email)
+        add_node("mark_for_human_attention", nodes.mark_for_human_attention)
+        add_node("skip_spam_email", nodes.skip_spam_email)
 
         # load inbox emails
         workflow.set_entry_point("load_inbox_emails")
 
-        # check if there are emails to process
-        workflow.add_edge("load_inbox_emails", "is_email_inbox_empty")
+        # categorize all loaded emails and design their RAG queries at once,
+        # then check if there are emails to process
+        workflow.add_edge("load_inbox_emails", "analyze_emails")
+        workflow.add_edge("analyze_emails", "is_email_inbox_empty")
         workflow.add_conditional_edges(
             "is_email_inbox_empty",
             nodes.check_new_emails,
             {
-                "process": "categorize_email",
+                "process": "select_next_email",
                 "empty": END
             }
         )
 
         # route email based on category
         workflow.add_conditional_edges(
-            "categorize_email",
+            "select_next_email",
             nodes.route_email_based_on_category,
             {
-                "product related": "construct_rag_queries",
+                "product related": "match_faq",
                 "not product related": "email_writer", # Feedback or Complaint
                 "unrelated": "skip_unrelated_email",
-                "spam": "skip_spam_email"
+                "spam": "skip_spam_email",
+                "human attention": "mark_for_human_attention" # Analysis failed
             }
         )
 
-        # pass constructed queries to RAG chain to retrieve information
-        workflow.add_edge("construct_rag_queries", "retrieve_from_rag")
+        # answer straight from the FAQ when possible, otherwise query the knowledge base
+        workflow.add_conditional_edges(
+            "match_faq",
+            lambda state: "faq_answer" if state["retrieved_documents"] else "knowledge_base",
+            {
+                "faq_answer": "email_writer",
+                "knowledge_base": "retrieve_from_rag"
+            }
+        )
 
         # Check if email needs human attention or can be handled by AI
         workflow.add_conditional_edges(
@@ -128,7 +146,7 @@ class Workflow():
             {
                 "send": email_action,  # Configurable based on HUMAN_INTERACTION
                 "rewrite": "email_writer",
-                "stop": "categorize_email"
+                "stop": "is_email_inbox_empty"
             }
         )
 
@@ -140,4 +158,20 @@ class Workflow():
         workflow.add_edge("mark_for_human_attention", "is_email_inbox_empty")
 
         # Compile
-        self.app = workflow.compile()
\ No newline at end of file
+        self.app = workflow.compile()
+        self.nodes = nodes
+
+    @classmethod
+    def get(cls, human_interaction: Optional[bool] = None) -> "Workflow":
+        """
+        Returns the compiled workflow for the given email handling mode, building it
+        only once per mode. Defaults to the HUMAN_INTERACTION environment setting.
+        """
+        if human_interaction is None:
+            human_interaction = human_interaction_from_env()
+        return cls._compiled(human_interaction)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _compiled(cls, human_interaction: bool) -> "Workflow":
+        return cls(human_interaction)
@@ -0,0 +1,43 @@
+"""
+Logging Configuration Module
+============================
+
+Shared logger setup for the workflow modules. The log level is read from the
+LOG_LEVEL environment variable (INFO by default), and console output is colored
+by level only when it is written to a terminal.
+"""
+
+import os
+import logging
+from colorama import Fore, Style
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_LEVEL_COLORS = {
+    logging.DEBUG: Fore.CYAN,
+    logging.INFO: Fore.GREEN,
+    logging.WARNING: Fore.YELLOW,
+    logging.ERROR: Fore.RED,
+    logging.CRITICAL: Fore.RED + Style.BRIGHT,
+}
+
+
+class ColorFormatter(logging.Formatter):
+    """Formatter coloring each record according to its level."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return _LEVEL_COLORS.get(record.levelno, "") + super().format(record) + Style.RESET_ALL
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns a logger with a console handler and the level set by LOG_LEVEL."""
+    logger = logging.getLogger(name)
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    # Add console handler if no handlers exist
+    if not logger.handlers:
+        console_handler = logging.StreamHandler()
+        formatter_class = ColorFormatter if console_handler.stream.isatty() else logging.Formatter
+        console_handler.setFormatter(formatter_class(LOG_FORMAT))
+        logger.addHandler(console_handler)
+    return logger
@@ -11,8 +11,9 @@ LangGraph workflow defined in graph.py. Each method corresponds to a specific gr
 that handles a distinct part of the email processing pipeline:
 
 1. Email Retrieval: Loading and checking new emails from inbox
-2. Classification: Categorizing emails by type (product inquiries, feedback, spam, etc.)
-3. RAG Operations: Constructing queries and retrieving information from knowledge base
+2. Analysis: Categorizing all loaded emails by type (product inquiries, feedback, spam, etc.)
+   and constructing their RAG queries
+3. RAG Operations: Retrieving information from knowledge base
 4. Email Generation: Writing, proofreading and refining email responses
 5. Action Execution: Creating drafts or sending replies based on configuration
 6. Special Cases: Handling spam, unrelated emails, or escalating to human attention
@@ -22,34 +23,90 @@ has clear responsibilities and can be modified independently.
 """
 
 
-from colorama import Fore, Style
+import re
+import atexit
+import asyncio
+from functools import lru_cache
+from typing import Optional
 from .agents import Agents
 from .tools.EmailTools import EmailToolsClass
 from .state import GraphState, Email
-import logging
+from .prompts import EMAIL_HTML_TEMPLATE
+from .logger import get_logger
 
 # Configure logging for nodes
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
-# Create console handler with formatting if no handlers exist
-if not logger.handlers:
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+# Patterns reliably identifying emails that do not need the categorization LLM.
+# Only bulk-mail platforms, a customer may well write from a "newsletter@" address
+_BULK_SENDER_RE = re.compile(
+    r"@(?:[\w-]+\.)*(?:mailchimp(?:app)?\.com|mcsv\.net|sendgrid\.net|mailgun\.org|hubspotemail\.net)$",
+    re.IGNORECASE
+)
+# Only tags added by spam filters, e.g. "[SPAM]" or "***SPAM***", customers may write about spam
+_SPAM_SUBJECT_RE = re.compile(r"^\s*[\[\*(]+\s*spam\s*[\]\*)]+", re.IGNORECASE)
+_UNSUBSCRIBE_RE = re.compile(
+    r"click here to unsubscribe|unsubscribe from this list|you are receiving this email because|"
+    r"si no (?:deseas|desea) recibir m[aá]s|haz clic aqu[ií] para darte de baja|darse de baja de esta lista",
+    re.IGNORECASE
+)
+# Only the prefix form of automatic replies, e.g. "Automatic reply: ...", not questions about them
+_AUTO_REPLY_SUBJECT_RE = re.compile(
+    r"^(?:out of office|automatic reply|auto-?reply|respuesta autom[aá]tica|fuera de la oficina)\s*:"
+    r"|^(?:undelivered mail|delivery status notification|mail delivery failed)",
+    re.IGNORECASE
+)
+# Where the text the sender wrote ends: a signature delimiter or the attribution line of a quoted email
+_QUOTE_START_RE = re.compile(
+    r"^-- ?$|^(?:On|El) .+(?:wrote|escribi[oó]):\s*$|^-{2,} ?(?:Original Message|Mensaje original) ?-{2,}",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+# Categories answered with information from the knowledge base
+_PRODUCT_CATEGORIES = frozenset({"product_enquiry", "lead_enquiry"})
+# Category of emails the LLM failed to analyze, they are left to a human
+_HUMAN_ATTENTION_CATEGORY = "human_attention"
+# Graph route of each email category, any other category is answered without retrieval
+_ROUTE = {
+    **{category: "product related" for category in _PRODUCT_CATEGORIES},
+    "unrelated": "unrelated",
+    "spam": "spam",
+    _HUMAN_ATTENTION_CATEGORY: "human attention",
+}
+
+# LLM calls in flight per analysis batch, a poll of 50 emails must stay below the provider rate limits
+_ANALYSIS_MAX_CONCURRENCY = 5
+
+# Writer history sent back to the LLM on rewrites: the last draft and its feedback
+_WRITER_HISTORY_SIZE = 2
+
+
+@lru_cache(maxsize=None)
+def _shared_agents() -> Agents:
+    """Returns the process-wide Agents instance, built on first use."""
+    return Agents()
+
+
+@lru_cache(maxsize=None)
+def _shared_email_tools() -> EmailToolsClass:
+    """Returns the process-wide EmailToolsClass instance, built on first use."""
+    email_tools = EmailToolsClass()
+    # Log out cleanly when the process exits
+    atexit.register(email_tools.close)
+    return email_tools
 
 
 class Nodes:
     def __init__(self):
-        self.agents = Agents()
-        self.email_tools = EmailToolsClass()
+        # LLM clients, chains and email tools are shared by every workflow in the process
+        self.agents = _shared_agents()
+        self.email_tools = _shared_email_tools()
         logger.debug("Nodes initialized with Agents and EmailTools")
 
     def load_new_emails(self, state: GraphState) -> GraphState:
         """Loads new emails and updates the state."""
-        print(Fore.YELLOW + "Loading new emails...\n" + Style.RESET_ALL)
+        logger.info("Loading new emails...")
         recent_emails = self.email_tools.fetch_unanswered_emails()
         emails = [Email(**email) for email in recent_emails]
         return {"emails": emails}
@@ -57,72 +114,145 @@ class Nodes:
     def check_new_emails(self, state: GraphState) -> str:
         """Checks if there are new emails to process."""
         if len(state['emails']) == 0:
-            print(Fore.RED + "No new emails" + Style.RESET_ALL)
+            logger.info("No new emails")
             return "empty"
         else:
-            print(Fore.GREEN + "New emails to process" + Style.RESET_ALL)
+            logger.info("New emails to process")
             return "process"
         
     def is_email_inbox_empty(self, state: GraphState) -> GraphState:
         return state
 
-    def categorize_email(self, state: GraphState) -> GraphState:
-        """Categorizes the current email using the categorize_email agent."""
-        print(Fore.YELLOW + "Checking email category...\n" + Style.RESET_ALL)
+    @staticmethod
+    def _prefilter_category(body: str, subject: str, sender: str) -> Optional[str]:
+        """Returns the category of emails detectable from cheap heuristics, None if the LLM must decide."""
+        # A reply quoting a newsletter is not a newsletter, only look at what the sender wrote
+        match = _QUOTE_START_RE.search(body)
+        own_text = "\n".join(
+            line for line in (body[:match.start()] if match else body).splitlines()
+            if not line.lstrip().startswith(">")
+        )
+        if _BULK_SENDER_RE.search(sender) or _SPAM_SUBJECT_RE.search(subject) or _UNSUBSCRIBE_RE.search(own_text):
+            return "spam"
+        if _AUTO_REPLY_SUBJECT_RE.search(subject):
+            return "unrelated"
+        return None
+
+    async def analyze_emails(self, state: GraphState) -> GraphState:
+        """Categorizes all loaded emails and designs their RAG queries with concurrent batched agent calls."""
+        logger.info("Checking email categories and designing RAG queries...")
+        emails = state["emails"]
+        categories = [self._prefilter_category(email.body, email.subject, email.sender) for email in emails]
+        rag_queries = [[] for _ in emails]
         
+        # Only emails the heuristics could not categorize are sent to the LLM
+        pending = [i for i, category in enumerate(categories) if category is None]
+        logger.debug("Prefilter categorized %d of %d emails", len(emails) - len(pending), len(emails))
+        inputs = [{"email": emails[i].body} for i in pending]
+
+        # Queries only depend on the email body, so design them while categorizing.
+        # The emails are already marked as read, one failed call must not lose the whole batch
+        batch_config = {"max_concurrency": _ANALYSIS_MAX_CONCURRENCY}
+        category_results, query_results = await asyncio.gather(
+            self.agents.categorize_email.abatch(inputs, config=batch_config, return_exceptions=True),
+            self.agents.design_rag_queries.abatch(inputs, config=batch_config, return_exceptions=True)
+        )
+        for i, category_result, query_result in zip(pending, category_results, query_results):
+            if isinstance(category_result, Exception) or category_result is None:
+                logger.error("Could not categorize email %s: %s", emails[i].id, category_result)
+                categories[i] = _HUMAN_ATTENTION_CATEGORY
+                continue
+            categories[i] = category_result.category.value
+            # Queries of emails that turn out not to be product related are discarded
+            if categories[i] in _PRODUCT_CATEGORIES:
+                if isinstance(query_result, Exception) or query_result is None:
+                    logger.error("Could not design RAG queries for email %s: %s", emails[i].id, query_result)
+                    categories[i] = _HUMAN_ATTENTION_CATEGORY
+                else:
+                    rag_queries[i] = query_result.queries
+        
+        analyzed_emails = [
+            email.model_copy(update={"category": category, "rag_queries": queries})
+            for email, category, queries in zip(emails, categories, rag_queries)
+        ]
+        return {"emails": analyzed_emails}
+
+    def select_next_email(self, state: GraphState) -> GraphState:
+        """Selects the next email to process along with its precomputed category and RAG queries."""
         # Get the last email
         current_email = state["emails"][-1]
-        result = self.agents.categorize_email.invoke({"email": current_email.body})
-        print(Fore.MAGENTA + f"Email category: {result.category.value}" + Style.RESET_ALL)
+        logger.info("Email category: %s", current_email.category)
         
+        # Start every email with a fresh writer history and trial count
         return {
-            "email_category": result.category.value,
-            "current_email": current_email
+            "email_category": current_email.category,
+            "current_email": current_email,
+            "rag_queries": current_email.rag_queries,
+            "retrieved_documents": "",
+            "writer_messages": [],
+            "trials": 0
         }
 
     def route_email_based_on_category(self, state: GraphState) -> str:
         """Routes the email based on its category."""
-        print(Fore.YELLOW + "Routing email based on category...\n" + Style.RESET_ALL)
-        category = state["email_category"]
-        if category == "product_enquiry" or category == "lead_enquiry":
-            return "product related"
-        elif category == "unrelated":
-            return "unrelated"
-        elif category == "spam":
-            return "spam"
-        else:
-            return "not product related"
+        logger.debug("Routing email based on category...")
+        return _ROUTE.get(state["email_category"], "not product related")
 
-    def construct_rag_queries(self, state: GraphState) -> GraphState:
-        """Constructs RAG queries based on the email content."""
-        print(Fore.YELLOW + "Designing RAG query...\n" + Style.RESET_ALL)
-        email_content = state["current_email"].body
-        query_result = self.agents.design_rag_queries.invoke({"email": email_content})
+    async def match_faq(self, state: GraphState) -> GraphState:
+        """Answers the email from the curated FAQ when it closely matches one of its questions."""
+        logger.info("Checking FAQ...")
+        faq_answer = await self.agents.faq.alookup(state["current_email"].body)
+        if faq_answer is None:
+            return {}
         
-        return {"rag_queries": query_result.queries}
+        logger.info("FAQ match found, skipping knowledge base retrieval")
+        return {"retrieved_documents": faq_answer + "\n\n", "needs_human_attention": False}
+
+    async def _answer_rag_query(self, query: str) -> str:
+        """Answers a single RAG query from internal knowledge, reusing cached answers to similar queries."""
+        rag_result = await self.agents.rag_answer_cache.alookup(query)
+        if rag_result is None:
+            rag_result = await self.agents.generate_rag_answer.ainvoke(query)
+            await self.agents.rag_answer_cache.aupdate(query, rag_result)
+        else:
+            logger.debug("RAG answer cache hit for query: %s", query)
+        return rag_result
 
-    def retrieve_from_rag(self, state: GraphState) -> GraphState:
+    async def retrieve_from_rag(self, state: GraphState) -> GraphState:
         """Retrieves information from internal knowledge based on RAG questions."""
-        print(Fore.YELLOW + "Retrieving information from internal knowledge...\n" + Style.RESET_ALL)
-        final_answer = ""
-        needs_human_attention = False
-        
-        for query in state["rag_queries"]:
-            rag_result = self.agents.generate_rag_answer.invoke(query)
-            # Check if the result is "null" indicating human attention needed
-            if rag_result == "null":
-                needs_human_attention = True
-                break
-            final_answer += query + "\n" + rag_result + "\n\n"
+        logger.info("Retrieving information from internal knowledge...")
+        queries = state["rag_queries"]
+
+        # Queries are answered concurrently, in completion order
+        tasks = [asyncio.create_task(self._answer_rag_query(query)) for query in queries]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                rag_result = await next_result
+                # A "null" result indicates human attention is needed,
+                # the answers still pending would be discarded anyway
+                if rag_result == "null":
+                    logger.debug("Null RAG answer, cancelling remaining queries")
+                    return {
+                        "retrieved_documents": "",
+                        "needs_human_attention": True
+                    }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        final_answer = "".join(
+            query + "\n" + task.result() + "\n\n"
+            for query, task in zip(queries, tasks)
+        )
         
         return {
             "retrieved_documents": final_answer,
-            "needs_human_attention": needs_human_attention
+            "needs_human_attention": False
         }
 
     def write_draft_email(self, state: GraphState) -> GraphState:
         """Writes a draft email based on the current email and retrieved information."""
-        print(Fore.YELLOW + "Writing draft email...\n" + Style.RESET_ALL)
+        logger.info("Writing draft email...")
         
         # Format input to the writer agent
         inputs = (
@@ -139,28 +269,31 @@ class Nodes:
             "email_information": inputs,
             "history": writer_messages
         })
-        email = draft_result.email
+        draft = draft_result.email
         trials = state.get('trials', 0) + 1
 
-        # Append writer's draft to the message list
-        writer_messages.append(f"**Draft {trials}:**\n{email}")
+        # Keep the writer's draft in a bounded history, older drafts are superseded
+        new_message = f"**Draft {trials}:**\n{draft}"
+        writer_messages = writer_messages[-(_WRITER_HISTORY_SIZE - 1):] + [new_message]
 
+        # The writer only drafts greeting and body, the signature and footer are fixed
         return {
-            "generated_email": email, 
+            "generated_email": EMAIL_HTML_TEMPLATE.substitute(content=draft), 
             "trials": trials,
             "writer_messages": writer_messages
         }
 
     def verify_generated_email(self, state: GraphState) -> GraphState:
         """Verifies the generated email using the proofreader agent."""
-        print(Fore.YELLOW + "Verifying generated email...\n" + Style.RESET_ALL)
+        logger.info("Verifying generated email...")
         review = self.agents.email_proofreader.invoke({
             "initial_email": state["current_email"].body,
             "generated_email": state["generated_email"],
         })
 
         writer_messages = state.get('writer_messages', [])
-        writer_messages.append(f"**Proofreader Feedback:**\n{review.feedback}")
+        new_message = f"**Proofreader Feedback:**\n{review.feedback}"
+        writer_messages = writer_messages[-(_WRITER_HISTORY_SIZE - 1):] + [new_message]
 
         return {
             "sendable": review.send,
@@ -170,121 +303,94 @@ class Nodes:
     def must_rewrite(self, state: GraphState) -> str:
         """Determines if the email needs to be rewritten based on the review and trial count."""
         email_sendable = state["sendable"]
-        logger.debug(f"Email proofreader check - Sendable: {email_sendable}, Trial count: {state['trials']}")
+        logger.debug("Email proofreader check - Sendable: %s, Trial count: %d", email_sendable, state["trials"])
         
         if email_sendable:
             logger.info("✅ Email approved by proofreader, ready to be sent")
-            print(Fore.GREEN + "Email is good, ready to be sent!!!" + Style.RESET_ALL)
             # Pop the email to avoid reprocessing
             email = state["emails"].pop()
-            logger.debug(f"Removed email from processing queue - Subject: {email.subject}, From: {email.sender}")
-            state["writer_messages"] = []
+            logger.debug("Removed email from processing queue - Subject: %s, From: %s", email.subject, email.sender)
             return "send"
         elif state["trials"] >= 3:
             logger.warning("⚠️ Email not approved after maximum trials, stopping further attempts")
-            print(Fore.RED + "Email is not good, we reached max trials must stop!!!" + Style.RESET_ALL)
             # Pop the email to avoid reprocessing
             email = state["emails"].pop()
-            logger.debug(f"Removed email from processing queue - Subject: {email.subject}, From: {email.sender}")
-            state["writer_messages"] = []
+            logger.debug("Removed email from processing queue - Subject: %s, From: %s", email.subject, email.sender)
             return "stop"
         else:
-            logger.info(f"📝 Email needs improvement (Trial {state['trials']}), requesting rewrite")
-            print(Fore.RED + "Email is not good, must rewrite it..." + Style.RESET_ALL)
+            logger.info("📝 Email needs improvement (Trial %d), requesting rewrite", state["trials"])
             return "rewrite"
 
-    def create_draft_response(self, state: GraphState) -> GraphState:
+    async def create_draft_response(self, state: GraphState) -> GraphState:
         """Creates a draft response in Gmail."""
-        print(Fore.YELLOW + "Creating draft email...\n" + Style.RESET_ALL)
         logger.info("Creating draft response")
         
         # Get information about the email
         sender = state["current_email"].sender
         subject = state["current_email"].subject
-        logger.debug(f"Creating draft reply to: {sender}, Subject: {subject}")
+        logger.debug("Creating draft reply to: %s, Subject: %s", sender, subject)
         
         # Log generated email preview
         email_preview = state["generated_email"][:100] + "..." if len(state["generated_email"]) > 100 else state["generated_email"]
-        logger.debug(f"Generated email preview: {email_preview}")
+        logger.debug("Generated email preview: %s", email_preview)
         
         # Convert Email object to dictionary
-        email_dict = {
-            "id": state["current_email"].id,
-            "threadId": state["current_email"].threadId,
-            "messageId": state["current_email"].messageId,
-            "references": state["current_email"].references,
-            "sender": state["current_email"].sender,
-            "subject": state["current_email"].subject,
-            "body": state["current_email"].body
-        }
+        email_dict = state["current_email"].to_dict()
         
         # Create draft reply
-        logger.debug("Calling email_tools.create_draft_reply")
-        result = self.email_tools.create_draft_reply(email_dict, state["generated_email"])
+        logger.debug("Calling email_tools.acreate_draft_reply")
+        result = await self.email_tools.acreate_draft_reply(email_dict, state["generated_email"])
         
         if result:
-            logger.info(f"✅ Draft reply created successfully for thread: {result.get('threadId', 'unknown')}")
-            print(Fore.GREEN + "Draft email created successfully!" + Style.RESET_ALL)
+            logger.info("✅ Draft reply created successfully for thread: %s", result.get("threadId", "unknown"))
         else:
             logger.error("❌ Failed to create draft reply")
-            print(Fore.RED + "Failed to create draft email!" + Style.RESET_ALL)
         
         return {"retrieved_documents": "", "trials": 0}
 
-    def send_email_response(self, state: GraphState) -> GraphState:
+    async def send_email_response(self, state: GraphState) -> GraphState:
         """Sends the email response directly using Gmail."""
-        print(Fore.YELLOW + "Sending email...\n" + Style.RESET_ALL)
         logger.info("Sending email response")
         
         # Get information about the email
         sender = state["current_email"].sender
         subject = state["current_email"].subject
-        logger.debug(f"Sending email to: {sender}, Subject: {subject}")
+        logger.debug("Sending email to: %s, Subject: %s", sender, subject)
         
         # Log generated email preview
         email_preview = state["generated_email"][:100] + "..." if len(state["generated_email"]) > 100 else state["generated_email"]
-        logger.debug(f"Generated email preview: {email_preview}")
+        logger.debug("Generated email preview: %s", email_preview)
         
         # Convert Email object to dictionary
-        email_dict = {
-            "id": state["current_email"].id,
-            "threadId": state["current_email"].threadId,
-            "messageId": state["current_email"].messageId,
-            "references": state["current_email"].references,
-            "sender": state["current_email"].sender,
-            "subject": state["current_email"].subject,
-            "body": state["current_email"].body
-        }
+        email_dict = state["current_email"].to_dict()
         
         # Send reply
-        logger.debug("Calling email_tools.send_reply")
-        result = self.email_tools.send_reply(email_dict, state["generated_email"])
+        logger.debug("Calling email_tools.asend_reply")
+        result = await self.email_tools.asend_reply(email_dict, state["generated_email"])
         
         if result:
-            logger.info(f"✅ Email sent successfully to {sender} for thread: {result.get('threadId', 'unknown')}")
-            print(Fore.GREEN + f"Email sent successfully to {sender}!" + Style.RESET_ALL)
+            logger.info("✅ Email sent successfully to %s for thread: %s", sender, result.get("threadId", "unknown"))
         else:
-            logger.error(f"❌ Failed to send email to {sender}")
-            print(Fore.RED + f"Failed to send email to {sender}!" + Style.RESET_ALL)
+            logger.error("❌ Failed to send email to %s", sender)
         
         return {"retrieved_documents": "", "trials": 0}
     
     def skip_unrelated_email(self, state):
         """Skip unrelated email and remove from emails list."""
-        print("Skipping unrelated email...\n")
+        logger.info("Skipping unrelated email...")
         state["emails"].pop()
         return state
 
     def skip_spam_email(self, state):
         """Skip spam email, mark as read, and remove from emails list."""
-        print(Fore.YELLOW + "Marking spam email as read and skipping it...\n" + Style.RESET_ALL)
+        logger.info("Marking spam email as read and skipping it...")
         # Just remove from our processing queue - it's already marked as read when fetched
         state["emails"].pop()
         return state
 
     def mark_for_human_attention(self, state: GraphState) -> GraphState:
         """Marks the email as needing human attention and leaves it unread in the inbox."""
-        print(Fore.RED + "Email requires human attention, leaving in inbox...\n" + Style.RESET_ALL)
+        logger.warning("Email requires human attention, leaving in inbox...")
         # Skip marking as read by not using email_tools.create_draft_reply
         # Just remove from our processing queue
         state["emails"].pop()
@@ -1,3 +1,6 @@
+from string import Template
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate, MessagesPlaceholder
+
 # catogorize email prompt template
 CATEGORIZE_EMAIL_PROMPT = """
 # **Role:**
@@ -114,32 +117,23 @@ You are a professional email writer working as part of the customer support team
    - **customer_complaint**: Express empathy, assure the customer their concerns are valued, and promise to do your best to resolve the issue.  
    - **customer_feedback**: Thank the customer for their input and assure them their feedback is appreciated and will be considered.  
    - **unrelated**: Politely ask the customer for more information and assure them of your willingness to help.  
-2. Write the email as HTML in the following format:  
+2. Write the greeting and body of the email as HTML in the following format:  
    ```html
-   <div style="font-family: Arial, sans-serif; color: #333333;">
-     <p>Dear [Customer Name],</p>
-     
-     <div style="margin: 20px 0;">
-       [Email body responding to the query, based on the category and information provided.]
-     </div>
-     
-     <p>Best regards,<br>
-     <strong>El equipo de AUDETIA</strong></p>
-     
-     <div style="margin-top: 30px; border-top: 1px solid #dddddd; padding-top: 20px; color: #777777; font-size: 12px;">
-       <p>AUDETIA - Atomatizacion y Desarrollo Tecnologico con IA</p>
-       <p>Contact us: <a href="mailto:contact@audetia.com" style="color: #0066cc;">contact@audetia.com</a></p>
-     </div>
+   <p>Dear [Customer Name],</p>
+   
+   <div style="margin: 20px 0;">
+     [Email body responding to the query, based on the category and information provided.]
    </div>
    ```  
    - Replace `[Customer Name]` with the customer's name if available, or "Customer" if n
    - Write in Spanish!
+   - Do not add a closing, signature or footer, they are appended automatically.
 
 3. If feedback is provided, use it to improve the email while ensuring it still aligns with the predefined guidelines.  
 
 # **Notes:**  
 
-* Return only the final HTML email without any additional explanation or preamble.  
+* Return only the HTML greeting and body without any additional explanation or preamble.  
 * Always maintain a professional and empathetic tone that aligns with the context of the email.  
 * If the information provided is insufficient, politely request additional details from the customer.  
 * Make sure to follow any feedback provided when crafting the email.  
@@ -184,4 +178,44 @@ You are provided with the **initial email** content written by the customer and
 * Be objective and fair in your assessment. Only reject the email if necessary.
 * Ensure feedback is clear, concise, and actionable.
 * The HTML formatting should enhance readability and professional appearance without being overly complex.
-"""
\ No newline at end of file
+"""
+
+
+# Prompt templates are parsed once at import time and shared by every agent chain
+CATEGORIZE_EMAIL_TEMPLATE = PromptTemplate(
+    template=CATEGORIZE_EMAIL_PROMPT,
+    input_variables=["email"]
+)
+
+GENERATE_RAG_QUERIES_TEMPLATE = PromptTemplate(
+    template=GENERATE_RAG_QUERIES_PROMPT,
+    input_variables=["email"]
+)
+
+GENERATE_RAG_ANSWER_TEMPLATE = ChatPromptTemplate.from_template(GENERATE_RAG_ANSWER_PROMPT)
+
+EMAIL_WRITER_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        ("system", EMAIL_WRITER_PROMPT),
+        MessagesPlaceholder("history"),
+        ("human", "{email_information}")
+    ]
+)
+
+# Fixed HTML wrapper around the writer's greeting and body
+EMAIL_HTML_TEMPLATE = Template("""<div style="font-family: Arial, sans-serif; color: #333333;">
+  $content
+  
+  <p>Best regards,<br>
+  <strong>El equipo de AUDETIA</strong></p>
+  
+  <div style="margin-top: 30px; border-top: 1px solid #dddddd; padding-top: 20px; color: #777777; font-size: 12px;">
+    <p>AUDETIA - Atomatizacion y Desarrollo Tecnologico con IA</p>
+    <p>Contact us: <a href="mailto:contact@audetia.com" style="color: #0066cc;">contact@audetia.com</a></p>
+  </div>
+</div>""")
+
+EMAIL_PROOFREADER_TEMPLATE = PromptTemplate(
+    template=EMAIL_PROOFREADER_PROMPT,
+    input_variables=["initial_email", "generated_email"]
+)
@@ -1,9 +1,14 @@
-from pydantic import BaseModel, Field
-from typing import List, Annotated
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List
 from typing_extensions import TypedDict
-from langgraph.graph.message import add_messages
+
+_EMAIL_TOOL_FIELDS = {"id", "threadId", "messageId", "references", "sender", "subject", "body"}
 
 class Email(BaseModel):
+    # Emails are never mutated in place (nodes use model_copy), freezing them
+    # skips assignment validation and lets extra fetched fields be dropped
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     id: str = Field(..., description="Unique identifier of the email")
     threadId: str = Field(..., description="Thread identifier of the email")
     messageId: str = Field(..., description="Message identifier of the email")
@@ -11,7 +16,13 @@ class Email(BaseModel):
     sender: str = Field(..., description="Email address of the sender")
     subject: str = Field(..., description="Subject line of the email")
     body: str = Field(..., description="Body content of the email")
-    
+    category: str = Field("", description="Category assigned to the email")
+    rag_queries: List[str] = Field(default_factory=list, description="Queries for the knowledge base, only for product related emails")
+
+    def to_dict(self) -> dict:
+        """Returns the fields of the original email, as expected by the email tools."""
+        return self.model_dump(include=_EMAIL_TOOL_FIELDS)
+
 class GraphState(TypedDict):
     emails: List[Email]
     current_email: Email
@@ -19,6 +30,7 @@ class GraphState(TypedDict):
     generated_email: str
     rag_queries: List[str]
     retrieved_documents: str
-    writer_messages: Annotated[list, add_messages]
+    needs_human_attention: bool
+    writer_messages: List[str]
     sendable: bool
     trials: int
\ No newline at end of file
@@ -26,7 +26,7 @@ class RAGQueriesOutput(BaseModel):
 class WriterOutput(BaseModel):
     email: str = Field(
         ..., 
-        description="The draft email written in response to the customer's inquiry, adhering to company tone and standards."
+        description="The greeting and body of the draft email written in response to the customer's inquiry, adhering to company tone and standards."
     )
 
 # **Proofreader Email Output**
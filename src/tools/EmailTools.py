@@ -2,30 +2,46 @@ import os
 import re
 import uuid
 import base64
-import logging
+import asyncio
 import imaplib
 import smtplib
+import threading
+import functools
+import time
+import queue
+import socket
 import email
-from bs4 import BeautifulSoup
+import email.policy
+import email.charset
+try:
+    # C-backed HTML parser, much faster than BeautifulSoup on long emails
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+    from bs4 import BeautifulSoup
+    try:
+        # BeautifulSoup is still C-backed on top of lxml
+        import lxml  # noqa: F401
+        _BS4_PARSER = 'lxml'
+    except ImportError:
+        _BS4_PARSER = 'html.parser'
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import takewhile
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Optional, Tuple, Dict
+from email.parser import BytesHeaderParser
+from typing import List, NamedTuple, Optional, Tuple, Dict
 from pathlib import Path
+from ..logger import get_logger
+from ..email_state import EmailStateStore, EMAIL_STATE_PATH
 
-# Configure advanced logging
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)  # Set to DEBUG for more detailed logs
-
-# Create console handler with formatting
-if not logger.handlers:
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+# Configure logging, set LOG_LEVEL=DEBUG for detailed connection logs
+logger = get_logger(__name__)
 
 # Email configuration - these should be loaded from environment variables or config file
 EMAIL_CONFIG = {
@@ -35,17 +51,304 @@ EMAIL_CONFIG = {
     "email_user": os.getenv("EMAIL_USER"),
     "email_pass": os.getenv("EMAIL_PASS"),
     "check_interval": int(os.getenv("EMAIL_CHECK_INTERVAL", "300")),  # 5 minutes default
+    "email_aliases": os.getenv("EMAIL_ALIASES", ""),  # Comma-separated extra addresses of the account
+    "allowed_domains": os.getenv("EMAIL_ALLOWED_DOMAINS", ""),  # Comma-separated, empty answers any domain
+    "state_path": os.getenv("EMAIL_STATE_PATH", EMAIL_STATE_PATH),  # SQLite database of the mailbox state
 }
 
+_REQUIRED_CONFIG = ("email_user", "email_pass", "imap_server", "smtp_server")
+
+class EmailConfig(NamedTuple):
+    """Validated, immutable snapshot of EMAIL_CONFIG taken by each EmailToolsClass."""
+    smtp_server: str
+    smtp_port: int
+    imap_server: str
+    email_user: str
+    email_pass: str
+    check_interval: int = 300
+    email_aliases: str = ""
+    allowed_domains: str = ""
+    state_path: str = EMAIL_STATE_PATH
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> "EmailConfig":
+        """
+        Builds the configuration from a dict like EMAIL_CONFIG.
+        
+        Raises:
+            ValueError: When a required setting is missing
+        """
+        missing = [field for field in _REQUIRED_CONFIG if not config.get(field)]
+        if missing:
+            raise ValueError(f"Missing required configuration: {', '.join(missing)}")
+        # Unset optional settings keep their defaults
+        return cls(**{field: config[field] for field in cls._fields if config.get(field) not in (None, "")})
+
+# HTML elements whose content is not part of the visible email body
+_INVISIBLE_HTML_TAGS = ['script', 'style', 'head', 'meta', 'title']
+
+# Body text cleanup: line breaks are dropped, other whitespace runs collapsed
+_DROP_LINE_BREAKS = str.maketrans('', '', '\r\n')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Document wrapped around the HTML reply, without whitespace between tags
+_HTML_PREFIX = (
+    '<!DOCTYPE html><html><head>'
+    '<meta charset="utf-8">'
+    '<meta name="viewport" content="width=device-width,initial-scale=1">'
+    '</head><body>'
+)
+_HTML_SUFFIX = '</body></html>\n'
+# Replies are mostly ASCII text, quoted-printable keeps it as is where base64 grows it by a third
+_HTML_CHARSET = email.charset.Charset("utf-8")
+_HTML_CHARSET.body_encoding = email.charset.QP
+_NEWLINE_RE = re.compile(r'\n|\\n')
+# Replies starting with a tag are sent as HTML, stops at the first non-blank character
+_HTML_START_RE = re.compile(r'\s*<')
+
+# Folder name at the end of a LIST response line, quoted or not
+_FOLDER_NAME_RE = re.compile(rb'"([^"]+)"\s*$|([^\s"]+)\s*$')
+
+# UID of an appended message reported by UIDPLUS servers (RFC 4315)
+_APPENDUID_RE = re.compile(rb'APPENDUID\s+\d+\s+(\d+)')
+
+# Items of a STATUS response
+_STATUS_ITEM_RE = re.compile(rb'(UIDVALIDITY|UIDNEXT|MESSAGES) (\d+)')
+
+# UID data item of a FETCH response
+_UID_RE = re.compile(rb'UID (\d+)')
+
+# Maximum number of messages per FETCH/STORE command, larger message sets
+# risk exceeding the server's maximum request size
+FETCH_BATCH_SIZE = 100
+
+# Parses headers only, leaving the body unparsed
+_HEADER_PARSER = BytesHeaderParser()
+
+# Maximum number of thread IDs remembered by Message-ID
+THREAD_ID_CACHE_SIZE = 4096
+
+# Worker threads parsing fetched emails
+PARSE_WORKERS = 8
+
+# Extra IMAP connections fetching batches of recent emails in parallel, together
+# with the main connection they must stay below the server's per-account limit
+# (15 simultaneous connections on Gmail)
+IMAP_POOL_SIZE = 4
+
+# Minimum number of messages per parallel fetch, fewer are fetched by the main connection
+PARALLEL_FETCH_MIN = 20
+
+# Seconds to wait for a pooled IMAP connection when all of them are lent
+IMAP_POOL_TIMEOUT = 120
+
+# SMTP connections sending replies concurrently, sending waits on the network
+# so it doesn't depend on the CPU count
+SMTP_POOL_SIZE = 4
+
+# Seconds an SMTP connection may stay unused before it is replaced, servers
+# drop idle clients after a few minutes
+SMTP_MAX_IDLE = 100
+
+# Seconds to wait for a pooled SMTP connection when all of them are lent
+SMTP_POOL_TIMEOUT = 120
+
+# Seconds an IMAP IDLE command is kept open, servers may drop connections
+# idle for 30 minutes so it is renewed before (RFC 2177)
+IDLE_TIMEOUT = 29 * 60
+# Seconds the server has to complete IDLE once told DONE
+IDLE_DONE_TIMEOUT = 60
+
+# Untagged response announcing the new size of the selected mailbox
+_EXISTS_RE = re.compile(rb'\* \d+ EXISTS')
+
+# Headers read by _get_thread_id and _get_email_info, fetched instead of the whole message
+_INFO_HEADER_FIELDS = "MESSAGE-ID REFERENCES IN-REPLY-TO FROM SUBJECT"
+_LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+
+def _tokenize_imap(chunks: List[bytes]):
+    """
+    Splits an IMAP response into tokens: b'(' and b')', atoms, quoted strings,
+    None for NIL, and literals (given as separate chunks after their {size} marker).
+    """
+    for chunk_index, chunk in enumerate(chunks):
+        if chunk_index % 2:
+            # Literal data
+            yield chunk
+            continue
+        i, size = 0, len(chunk)
+        while i < size:
+            char = chunk[i:i + 1]
+            if char in b" \r\n":
+                i += 1
+            elif char in b"()":
+                yield char
+                i += 1
+            elif char == b'"':
+                # Quoted string, backslash escapes the next character
+                value = bytearray()
+                i += 1
+                while i < size and chunk[i:i + 1] != b'"':
+                    if chunk[i:i + 1] == b"\\":
+                        i += 1
+                    value += chunk[i:i + 1]
+                    i += 1
+                yield bytes(value)
+                i += 1
+            elif char == b"{" and _LITERAL_RE.match(chunk, i):
+                # Literal marker, its data is the next chunk
+                i = size
+            else:
+                # Atom, section specifiers like BODY[HEADER.FIELDS (FROM)] may contain spaces
+                start, depth = i, 0
+                while i < size:
+                    char = chunk[i:i + 1]
+                    if char == b"[":
+                        depth += 1
+                    elif char == b"]":
+                        depth -= 1
+                    elif depth == 0 and char in b" ()\r\n":
+                        break
+                    i += 1
+                atom = chunk[start:i]
+                yield None if atom.upper() == b"NIL" else atom
+
+def _parse_imap_list(tokens) -> list:
+    """Parses tokens up to the closing parenthesis of the current list into nested lists."""
+    items = []
+    for token in tokens:
+        if token == b"(":
+            items.append(_parse_imap_list(tokens))
+        elif token == b")":
+            break
+        else:
+            items.append(token)
+    return items
+
+def _parse_fetch_response(msg_data: list) -> List[Dict[bytes, object]]:
+    """
+    Parses the response of a FETCH command into one dict per message, mapping
+    each data item name (e.g. b'UID', b'BODYSTRUCTURE') to its value.
+    """
+    # Flatten imaplib's (prefix, literal) tuples into alternating text and literal chunks
+    chunks = [b""]
+    for response in msg_data:
+        if isinstance(response, tuple):
+            chunks[-1] += b" " + response[0]
+            chunks.extend((response[1], b""))
+        elif response is not None:
+            chunks[-1] += b" " + response
+    
+    tokens = _tokenize_imap(chunks)
+    messages = []
+    for token in tokens:
+        if token == b"(":
+            items = _parse_imap_list(tokens)
+            messages.append({
+                name.upper() if isinstance(name, bytes) else name: value
+                for name, value in zip(items[0::2], items[1::2])
+            })
+    return messages
+
+def _find_text_part(structure: list, section: str = "") -> Optional[Tuple[str, list]]:
+    """
+    Returns the section number and BODYSTRUCTURE of the first text/plain part,
+    or of the first text/html part when there is none.
+    """
+    if structure and isinstance(structure[0], list):
+        # Multipart: child parts, followed by the subtype and extension data
+        html_part = None
+        for index, child in enumerate(takewhile(lambda item: isinstance(item, list), structure)):
+            child_section = f"{section}.{index + 1}" if section else str(index + 1)
+            found = _find_text_part(child, child_section)
+            if found is None:
+                continue
+            if found[1][1].lower() == b"plain":
+                return found
+            html_part = html_part or found
+        return html_part
+    
+    content_type = (structure[0] or b"").lower(), (structure[1] or b"").lower()
+    if content_type in ((b"text", b"plain"), (b"text", b"html")):
+        return section or "1", structure
+    return None
+
+def _first_message_id(value: str) -> str:
+    """
+    Returns the first message ID of a header without its angle brackets, without
+    splitting the whole header (References lists every message of the thread).
+    """
+    start = value.find("<")
+    if start != -1:
+        end = value.find(">", start + 1)
+        if end != -1:
+            return value[start + 1:end]
+    # IDs not enclosed in angle brackets
+    token = value.split(None, 1)
+    return token[0].strip("<>") if token else ""
+
+def _holding_imap_lock(method):
+    """Runs the method with exclusive use of the shared IMAP connection, imaplib is not thread-safe."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._imap_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class EmailToolsClass:
     def __init__(self):
         """Initialize email tools with IMAP and SMTP connections."""
-        self._validate_config()
-        self.email_user = EMAIL_CONFIG["email_user"]
-        self.email_pass = EMAIL_CONFIG["email_pass"]
-        self.imap_server = EMAIL_CONFIG["imap_server"]
-        self.smtp_server = EMAIL_CONFIG["smtp_server"]
-        self.smtp_port = EMAIL_CONFIG["smtp_port"]
+        self.config = EmailConfig.from_dict(EMAIL_CONFIG)
+        self.email_user = self.config.email_user
+        self.email_pass = self.config.email_pass
+        self.imap_server = self.config.imap_server
+        self.smtp_server = self.config.smtp_server
+        self.smtp_port = self.config.smtp_port
+        
+        # Lowercased addresses of our own, emails sent from them are not answered
+        self._own_addresses = frozenset(
+            address.strip().lower()
+            for address in [self.email_user, *self.config.email_aliases.split(",")]
+            if address.strip()
+        )
+        # Lowercased sender domains answered, empty when any domain is
+        self._allowed_domains = frozenset(
+            domain.strip().lstrip("@").lower()
+            for domain in self.config.allowed_domains.split(",") if domain.strip()
+        )
+        # Inbox search criteria besides the date, the server filters out senders we would skip
+        self._search_criteria = self._build_sender_criteria()
+        
+        # Connections opened on first use and reused by later operations
+        self._imap: Optional[imaplib.IMAP4_SSL] = None
+        self._imap_lock = threading.RLock()
+        # Idle SMTP connections with the time they were last used, opened on demand up to SMTP_POOL_SIZE
+        self._smtp_pool: "queue.Queue[Tuple[smtplib.SMTP, float]]" = queue.Queue()
+        self._smtp_open = 0
+        self._smtp_lock = threading.Lock()
+        # Idle connections of the parallel fetch pool, opened on demand up to IMAP_POOL_SIZE
+        self._imap_pool: "queue.Queue[imaplib.IMAP4_SSL]" = queue.Queue()
+        self._imap_pool_open = 0
+        self._imap_pool_lock = threading.Lock()
+        # Connection waiting for new emails with IDLE, it can't run other commands meanwhile
+        self._idle_imap: Optional[imaplib.IMAP4_SSL] = None
+        
+        # Last fetched UIDs and threads with drafts, kept between polls and restarts
+        self._state = EmailStateStore(self.config.state_path)
+        
+        # Thread IDs of already seen messages, keyed by Message-ID, oldest first.
+        # Parsing workers share it, the lock keeps the size check and the eviction together
+        self._thread_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._thread_ids_lock = threading.Lock()
+        
+        # Drafts by UID and the drafts folder status they were listed at
+        self._drafts: Dict[bytes, Dict] = {}
+        self._drafts_status: Optional[Tuple[int, ...]] = None
+        self._drafts_lock = threading.Lock()
+        
+        # Drafts folder name, resolved on first use
+        self._draft_folder: Optional[str] = None
+        self._draft_folder_lock = threading.Lock()
         
         # Log configuration (without sensitive info)
         logger.info("EmailTools initialized with configuration:")
@@ -54,12 +357,17 @@ class EmailToolsClass:
         logger.info(f"  User: {self.email_user}")
         logger.info(f"  Credentials: {'✓ Set' if self.email_pass else '✗ Missing'}")
         
-    def _validate_config(self) -> None:
-        """Validate that all required configuration is present."""
-        required_fields = ["email_user", "email_pass", "imap_server", "smtp_server"]
-        missing = [field for field in required_fields if not EMAIL_CONFIG.get(field)]
-        if missing:
-            raise ValueError(f"Missing required configuration: {', '.join(missing)}")
+    def _build_sender_criteria(self) -> str:
+        """Builds the IMAP SEARCH criteria excluding our own emails and senders outside the allowed domains."""
+        criteria = f'NOT FROM "{self.email_user}"'
+        domains = sorted(self._allowed_domains)
+        if domains:
+            # IMAP's OR takes exactly two keys: OR FROM a OR FROM b FROM c
+            domain_criteria = f'FROM "@{domains[-1]}"'
+            for domain in reversed(domains[:-1]):
+                domain_criteria = f'OR FROM "@{domain}" {domain_criteria}'
+            criteria += f" {domain_criteria}"
+        return criteria
 
     def connect_to_inbox(self) -> imaplib.IMAP4_SSL:
         """
@@ -93,6 +401,197 @@ class EmailToolsClass:
             logger.error(f"Unexpected error connecting to inbox: {str(e)}")
             raise
 
+    def _get_imap(self) -> imaplib.IMAP4_SSL:
+        """
+        Returns the reusable IMAP connection with the inbox selected,
+        reconnecting when there is none yet or the server dropped it.
+        """
+        if self._imap is not None:
+            try:
+                # Selecting the inbox again also checks the connection is alive
+                result, _ = self._imap.select('"INBOX"')
+                if result == "OK":
+                    return self._imap
+            except (imaplib.IMAP4.error, OSError) as e:
+                logger.debug(f"IMAP connection lost: {str(e)}")
+            self._close_broken_imap(self._imap)
+            self._imap = None
+            
+        self._imap = self.connect_to_inbox()
+        return self._imap
+
+    @contextmanager
+    def _lease_imap(self):
+        """
+        Lends a connection of the parallel fetch pool with the inbox selected,
+        opening a new one while there are fewer than IMAP_POOL_SIZE and replacing
+        the ones the server dropped.
+        """
+        try:
+            mail = self._imap_pool.get_nowait()
+        except queue.Empty:
+            with self._imap_pool_lock:
+                can_open = self._imap_pool_open < IMAP_POOL_SIZE
+                if can_open:
+                    self._imap_pool_open += 1
+            mail = None
+            if not can_open:
+                try:
+                    mail = self._imap_pool.get(timeout=IMAP_POOL_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError(f"No pooled IMAP connection was returned within {IMAP_POOL_TIMEOUT} seconds")
+        
+        try:
+            if mail is not None:
+                try:
+                    # Selecting the inbox again makes new messages visible and checks the connection
+                    result, _ = mail.select('"INBOX"')
+                    if result != "OK":
+                        self._close_broken_imap(mail)
+                        mail = None
+                except (imaplib.IMAP4.error, OSError) as e:
+                    logger.debug(f"Pooled IMAP connection lost: {str(e)}")
+                    self._close_broken_imap(mail)
+                    mail = None
+            if mail is None:
+                mail = self.connect_to_inbox()
+        except Exception:
+            with self._imap_pool_lock:
+                self._imap_pool_open -= 1
+            raise
+        
+        try:
+            yield mail
+        finally:
+            self._imap_pool.put(mail)
+
+    @staticmethod
+    def _close_broken_imap(mail: imaplib.IMAP4_SSL) -> None:
+        """Closes the socket of a connection being replaced, a LOGOUT may never be answered."""
+        try:
+            mail.shutdown()
+        except Exception as e:
+            logger.debug(f"Error closing IMAP connection: {str(e)}")
+
+    def _connect_smtp(self) -> smtplib.SMTP:
+        """Establishes an authenticated connection to the SMTP server."""
+        logger.debug(f"Connecting to SMTP server {self.smtp_server}:{self.smtp_port}")
+        if self.smtp_port == 465:
+            logger.debug("Using SMTP_SSL connection")
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
+        else:
+            logger.debug("Using standard SMTP connection with STARTTLS")
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            server.starttls()
+            
+        logger.debug(f"Logging in to SMTP server as {self.email_user}")
+        server.login(self.email_user, self.email_pass)
+        return server
+
+    @contextmanager
+    def _lease_smtp(self):
+        """
+        Lends an SMTP connection of the pool, opening a new one while there are
+        fewer than SMTP_POOL_SIZE. Connections idle for more than SMTP_MAX_IDLE
+        seconds or no longer accepting a RSET are replaced.
+        """
+        while True:
+            try:
+                server, last_used = self._smtp_pool.get_nowait()
+            except queue.Empty:
+                with self._smtp_lock:
+                    can_open = self._smtp_open < SMTP_POOL_SIZE
+                    if can_open:
+                        self._smtp_open += 1
+                if not can_open:
+                    try:
+                        server, last_used = self._smtp_pool.get(timeout=SMTP_POOL_TIMEOUT)
+                    except queue.Empty:
+                        raise TimeoutError(f"No pooled SMTP connection was returned within {SMTP_POOL_TIMEOUT} seconds")
+                else:
+                    try:
+                        server = self._connect_smtp()
+                    except Exception:
+                        with self._smtp_lock:
+                            self._smtp_open -= 1
+                        raise
+                    break
+            
+            if time.monotonic() - last_used > SMTP_MAX_IDLE:
+                logger.debug("Closing idle SMTP connection")
+                self._discard_smtp(server, quit=True)
+                continue
+            try:
+                # RSET both checks the connection and clears any half-finished transaction
+                if server.rset()[0] == 250:
+                    break
+            except (smtplib.SMTPException, OSError) as e:
+                logger.debug(f"SMTP connection lost: {str(e)}")
+            self._discard_smtp(server)
+        
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._discard_smtp(server)
+            raise
+        except Exception:
+            # e.g. refused recipients, the connection itself is still usable
+            self._smtp_pool.put((server, time.monotonic()))
+            raise
+        else:
+            self._smtp_pool.put((server, time.monotonic()))
+
+    def _discard_smtp(self, server: smtplib.SMTP, quit: bool = False) -> None:
+        """Closes an SMTP connection taken out of the pool."""
+        with self._smtp_lock:
+            self._smtp_open -= 1
+        try:
+            if quit:
+                server.quit()
+            else:
+                server.close()
+        except Exception as e:
+            logger.debug(f"Error closing SMTP connection: {str(e)}")
+
+    def close(self) -> None:
+        """Closes the reusable IMAP and SMTP connections, including idle pooled ones."""
+        with self._imap_lock:
+            if self._imap is not None:
+                try:
+                    self._imap.logout()
+                    logger.debug("IMAP session closed")
+                except Exception as e:
+                    logger.debug(f"Error closing IMAP session: {str(e)}")
+                self._imap = None
+        with self._imap_pool_lock:
+            while not self._imap_pool.empty():
+                try:
+                    self._imap_pool.get_nowait().logout()
+                except Exception as e:
+                    logger.debug(f"Error closing pooled IMAP session: {str(e)}")
+                self._imap_pool_open -= 1
+        if self._idle_imap is not None:
+            # It may be in the middle of an IDLE command, LOGOUT would not be answered
+            try:
+                self._idle_imap.shutdown()
+            except Exception as e:
+                logger.debug(f"Error closing IDLE session: {str(e)}")
+            self._idle_imap = None
+        with self._smtp_lock:
+            while not self._smtp_pool.empty():
+                try:
+                    self._smtp_pool.get_nowait()[0].quit()
+                    logger.debug("SMTP connection closed")
+                except Exception as e:
+                    logger.debug(f"Error closing SMTP connection: {str(e)}")
+                self._smtp_open -= 1
+
+    def __enter__(self) -> "EmailToolsClass":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
     def _get_folder_name(self, folder_bytes: bytes) -> Optional[str]:
         """
         Safely extracts a folder name from IMAP LIST response.
@@ -105,30 +604,143 @@ class EmailToolsClass:
             Folder name as string or None if parsing fails
         """
         try:
-            folder_str = folder_bytes.decode()
-            
-            # Try different parsing methods based on common IMAP server formats
-            
-            # Format: * LIST (\HasNoChildren) "/" "INBOX"
-            if '"' in folder_str:
-                parts = folder_str.split('"')
-                if len(parts) >= 2:
-                    return parts[-2]  # Get the part between the last two quotes
-            
-            # Format: * LIST (\HasNoChildren) "/" INBOX
-            if '/' in folder_str:
-                parts = folder_str.split('/')
-                if len(parts) >= 2:
-                    # Get the last part and strip any trailing whitespace or closing paren
-                    return parts[-1].strip().rstrip(')')
+            # Formats: * LIST (\HasNoChildren) "/" "INBOX"
+            #          * LIST (\HasNoChildren) "/" INBOX
+            match = _FOLDER_NAME_RE.search(folder_bytes)
+            if match:
+                return (match.group(1) or match.group(2)).decode()
                     
-            # If above methods fail, just return the whole string for debugging
-            return folder_str
+            # If the format is not recognized, just return the whole string for debugging
+            return folder_bytes.decode()
             
         except Exception as e:
             logger.error(f"Error parsing folder name: {str(e)}")
             return None
 
+    def _resolve_draft_folder(self, mail: imaplib.IMAP4_SSL) -> Optional[str]:
+        """
+        Returns the name of the Drafts folder, listing the account folders only
+        the first time since their layout does not change between calls.
+        
+        Args:
+            mail: Authenticated IMAP connection
+            
+        Returns:
+            Drafts folder name or None if the account has none
+        """
+        with self._draft_folder_lock:
+            if self._draft_folder is None:
+                logger.debug("Searching for Drafts folder")
+                if "SPECIAL-USE" in mail.capabilities:
+                    # Only list the special-use folders (Drafts, Sent, Trash...)
+                    try:
+                        result, folders = mail.list('(SPECIAL-USE) ""', '*')
+                        if result == "OK":
+                            self._draft_folder = self._find_draft_folder(folders)
+                    except imaplib.IMAP4.error as e:
+                        logger.debug(f"SPECIAL-USE listing refused: {str(e)}")
+                if self._draft_folder is None:
+                    # Not advertised, refused, or no folder flagged \Drafts in it
+                    result, folders = mail.list()
+                    if result == "OK":
+                        self._draft_folder = self._find_draft_folder(folders)
+                if self._draft_folder:
+                    logger.debug(f"Found Drafts folder: {self._draft_folder}")
+            return self._draft_folder
+
+    def _find_draft_folder(self, folders: list) -> Optional[str]:
+        """Returns the name of the folder flagged \\Drafts in a LIST response, if any."""
+        for folder in folders or []:
+            if folder and b"\\Drafts" in folder:
+                # Use our helper method to safely extract folder name
+                return self._get_folder_name(folder)
+        return None
+
+    def start_watching(self) -> None:
+        """
+        Opens the connection used by wait_for_new_emails, before the inbox is first
+        processed: emails arriving meanwhile are reported by the first wait.
+        """
+        if self._idle_imap is None:
+            self._idle_imap = self.connect_to_inbox()
+
+    def wait_for_new_emails(self, timeout: float = IDLE_TIMEOUT) -> bool:
+        """
+        Blocks until the server announces new inbox messages or the timeout expires,
+        using IMAP IDLE on a connection of its own. Servers without IDLE are polled
+        instead, waiting check_interval seconds.
+        
+        Args:
+            timeout: Maximum seconds to wait, IDLE_TIMEOUT at most
+            
+        Returns:
+            True when new messages may have arrived, False when the wait timed out
+        """
+        try:
+            self.start_watching()
+            mail = self._idle_imap
+            
+            if "IDLE" not in mail.capabilities:
+                time.sleep(min(timeout, self.config.check_interval))
+                return True
+            
+            tag = mail._new_tag()
+            mail.send(tag + b" IDLE\r\n")
+            # Changes since the last command are reported before the continuation
+            new_emails = False
+            while True:
+                response = mail.readline()
+                if response.startswith(b"+"):
+                    break
+                if not response.startswith(b"*") or response.startswith(b"* BYE"):
+                    raise imaplib.IMAP4.error(f"IDLE refused: {response!r}")
+                new_emails = new_emails or bool(_EXISTS_RE.match(response))
+            
+            # Wait for an EXISTS notification, other untagged responses (EXPUNGE, FETCH) are ignored
+            deadline = time.monotonic() + timeout
+            default_timeout = mail.sock.gettimeout()
+            try:
+                while not new_emails:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    mail.sock.settimeout(remaining)
+                    try:
+                        line = mail.readline()
+                    except socket.timeout:
+                        # A file object that timed out refuses further reads, nothing was pending
+                        mail.file = mail.sock.makefile("rb")
+                        break
+                    if not line or line.startswith(b"* BYE"):
+                        raise imaplib.IMAP4.abort("Server closed the IDLE connection")
+                    new_emails = bool(_EXISTS_RE.match(line))
+                
+                # End IDLE, the server completes the command with the tagged response
+                mail.sock.settimeout(IDLE_DONE_TIMEOUT)
+                mail.send(b"DONE\r\n")
+                while True:
+                    line = mail.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("Server closed the IDLE connection")
+                    if line.startswith(tag):
+                        break
+                    new_emails = new_emails or bool(_EXISTS_RE.match(line))
+            finally:
+                mail.sock.settimeout(default_timeout)
+            return new_emails
+            
+        except Exception as e:
+            # Reconnect on the next wait, meanwhile let the caller check the inbox
+            logger.warning(f"IDLE failed, checking the inbox instead: {str(e)}")
+            if self._idle_imap is not None:
+                try:
+                    self._idle_imap.shutdown()
+                except Exception:
+                    pass
+                self._idle_imap = None
+            time.sleep(min(timeout, 5))
+            return True
+
     def fetch_unanswered_emails(self, max_results: int = 50) -> List[Dict]:
         """
         Fetches unanswered emails from the last 8 hours, excluding threads
@@ -142,25 +754,33 @@ class EmailToolsClass:
         """
         try:
             logger.debug(f"Fetching up to {max_results} unanswered emails")
+            # List the drafts on a pooled connection while the inbox is fetched,
+            # the thread finishes on its own if there are no recent emails
+            executor = ThreadPoolExecutor(max_workers=1)
+            drafts_future = executor.submit(self._fetch_draft_replies_pooled)
+            executor.shutdown(wait=False)
+            
             # Get recent emails
             recent_emails = self.fetch_recent_emails(max_results)
             if not recent_emails:
                 logger.info("No recent emails found")
                 return []
 
-            # Always check drafts to avoid duplicate work, regardless of HUMAN_INTERACTION setting
+            # Always check drafts to avoid duplicate work, regardless of HUMAN_INTERACTION setting.
+            # The stored threads cover drafts the folder listing missed (it failed or isn't updated yet)
             threads_with_drafts = set()
             try:
                 logger.debug("Checking for existing drafts to avoid duplicates")
-                drafts = self.fetch_draft_replies()
-                threads_with_drafts = {draft['threadId'] for draft in drafts}
+                drafts = drafts_future.result()
+                threads_with_drafts = {draft['threadId'] for draft in drafts} | self._state.draft_threads()
                 logger.debug(f"Found {len(threads_with_drafts)} threads with existing drafts")
             except Exception as draft_error:
                 logger.warning(f"Could not fetch drafts: {draft_error}")
+                threads_with_drafts = self._state.draft_threads()
 
-            # Process new emails
+            # Keep one new email per thread without a draft
             seen_threads = set()
-            unanswered_emails = []
+            new_emails = []
             
             for email_msg in recent_emails:
                 thread_id = self._get_thread_id(email_msg)
@@ -174,11 +794,17 @@ class EmailToolsClass:
                     continue
                     
                 seen_threads.add(thread_id)
-                email_info = self._get_email_info(email_msg)
-                
-                # Skip emails sent by us
+                new_emails.append(email_msg)
+
+            # Parsing bodies (HTML extraction) is independent per email, spread it over threads
+            with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as executor:
+                email_infos = list(executor.map(self._get_email_info, new_emails))
+
+            unanswered_emails = []
+            for email_info in email_infos:
+                # Skip emails sent by us or from other domains, normally already excluded by the inbox search
                 if self._should_skip_email(email_info):
-                    logger.debug(f"Skipping email from {email_info['sender']} - sent by us")
+                    logger.debug(f"Skipping email from {email_info['sender']} - sent by us or domain not allowed")
                     continue
                     
                 logger.info(f"Found unanswered email: Subject: {email_info['subject']}, From: {email_info['sender']}")
@@ -191,6 +817,7 @@ class EmailToolsClass:
             logger.error(f"Error fetching unanswered emails: {str(e)}")
             return []
 
+    @_holding_imap_lock
     def fetch_recent_emails(self, max_results: int = 50) -> List[email.message.Message]:
         """
         Fetches recent unread emails from the last 8 hours.
@@ -202,67 +829,311 @@ class EmailToolsClass:
             List of email.message.Message objects
         """
         try:
-            mail = self.connect_to_inbox()
+            mail = self._get_imap()
             
             # Calculate time range (8 hours ago)
             time_ago = datetime.now() - timedelta(hours=8)
             date_string = time_ago.strftime("%d-%b-%Y")
             
-            # Search for unread emails from the last 8 hours
-            search_query = f'(UNSEEN SINCE "{date_string}")'
-            result, data = mail.search(None, search_query)
+            # Only messages above the last UID fetched are new, as long as the
+            # UIDs of the inbox were not reset (UIDVALIDITY changed)
+            status = self._get_selected_status(mail)
+            stored = self._state.get_mailbox("INBOX")
+            last_uid = stored[1] if status and stored and stored[0] == status[0] else 0
+            if last_uid and status[1] <= last_uid + 1:
+                logger.debug("No new emails since the last poll")
+                return []
+            uid_range = f"UID {last_uid + 1}:* " if last_uid else ""
+            
+            # Search for unread emails from the last 8 hours, not sent by us and from allowed domains
+            search_query = f'({uid_range}UNSEEN SINCE "{date_string}" {self._search_criteria})'
+            result, data = mail.uid("SEARCH", None, search_query)
             
             if result != "OK":
                 logger.warning(f"Email search failed: {result}")
                 return []
+            
+            # "n:*" always matches the last message, even when its UID is below n
+            found_ids = [uid for uid in data[0].split() if int(uid) > last_uid]
+            email_ids = found_ids[:max_results]  # Limit to max_results
+            
+            marked: List[bytes] = []
+            # Split the messages among the pool connections, small searches
+            # are not worth the extra round trips and stay on this connection
+            chunk_size = max(-(-len(email_ids) // IMAP_POOL_SIZE), PARALLEL_FETCH_MIN)
+            chunks = self._batches(email_ids, chunk_size)
+            if len(chunks) <= 1:
+                emails = self._fetch_and_mark_read(mail, email_ids, marked)
+            else:
+                results: Dict[int, List[email.message.Message]] = {}
+                with ThreadPoolExecutor(max_workers=min(len(chunks), IMAP_POOL_SIZE)) as executor:
+                    futures = {
+                        executor.submit(self._fetch_chunk_pooled, chunk, marked): index
+                        for index, chunk in enumerate(chunks)
+                    }
+                    for future in as_completed(futures):
+                        try:
+                            results[futures[future]] = future.result()
+                        except Exception as e:
+                            logger.error(f"Error fetching {len(chunks[futures[future]])} emails in parallel: {str(e)}")
                 
-            email_ids = data[0].split()[:max_results]  # Limit to max_results
+                # Keep the server order of the messages
+                emails = [msg for index in sorted(results) for msg in results[index]]
             
-            emails = []
-            for e_id in email_ids:
-                try:
-                    result, msg_data = mail.fetch(e_id, "(RFC822)")
-                    if result != "OK":
-                        continue
-                        
-                    email_msg = email.message_from_bytes(msg_data[0][1])
-                    emails.append(email_msg)
-                    
-                    # Mark as read
-                    mail.store(e_id, '+FLAGS', '\\Seen')
-                except Exception as e:
-                    logger.error(f"Error fetching email {e_id}: {str(e)}")
-                    
-            mail.logout()
+            if status:
+                # Only the messages marked as read are done with, the first one
+                # that wasn't is searched again by the next poll
+                marked_set = set(marked)
+                done = list(takewhile(lambda uid: uid in marked_set, email_ids))
+                if len(done) < len(email_ids):
+                    fetched_up_to = int(email_ids[len(done)]) - 1
+                elif len(found_ids) > len(email_ids):
+                    fetched_up_to = int(email_ids[-1])
+                else:
+                    fetched_up_to = status[1] - 1
+                self._state.set_mailbox("INBOX", status[0], max(fetched_up_to, last_uid))
             return emails
             
         except Exception as e:
             logger.error(f"Error in fetch_recent_emails: {str(e)}")
             return []
 
+    def _get_mailbox_status(self, mail: imaplib.IMAP4_SSL, folder: str,
+                            items: Tuple[str, ...] = ("UIDVALIDITY", "UIDNEXT")) -> Optional[Tuple[int, ...]]:
+        """Returns the values of the STATUS items of a folder, None when the server doesn't report them all."""
+        try:
+            result, data = mail.status(f'"{folder}"', f"({' '.join(items)})")
+            if result != "OK":
+                return None
+            values = {name.decode(): int(value) for name, value in _STATUS_ITEM_RE.findall(data[0])}
+        except (imaplib.IMAP4.error, TypeError, ValueError, IndexError) as e:
+            logger.debug(f"Could not read the status of {folder}: {str(e)}")
+            return None
+        if any(item not in values for item in items):
+            return None
+        return tuple(values[item] for item in items)
+
+    def _get_selected_status(self, mail: imaplib.IMAP4_SSL) -> Optional[Tuple[int, int]]:
+        """
+        Returns the (UIDVALIDITY, UIDNEXT) the server sent when the folder was
+        selected, None when it didn't send them both.
+        """
+        values = []
+        for code in ("UIDVALIDITY", "UIDNEXT"):
+            try:
+                # Codes of earlier SELECTs may be left over, the last one is current
+                _, data = mail.response(code)
+                values.append(int(data[-1]))
+            except (TypeError, ValueError, IndexError) as e:
+                logger.debug(f"No {code} in the SELECT response: {str(e)}")
+                return None
+        return tuple(values)
+
+    def _fetch_chunk_pooled(self, email_ids: List[bytes], marked: List[bytes]) -> List[email.message.Message]:
+        """Fetches and marks as read the given messages with a connection of the pool."""
+        with self._lease_imap() as mail:
+            return self._fetch_and_mark_read(mail, email_ids, marked)
+
+    def _fetch_and_mark_read(self, mail: imaplib.IMAP4_SSL, email_ids: List[bytes], marked: List[bytes]) -> List[email.message.Message]:
+        """
+        Fetches the given messages batch by batch, marking as read only the ones
+        fetched. The UIDs marked as read are added to marked, the others are left
+        unread for the next poll to fetch them again.
+        """
+        emails = []
+        for batch in self._batches(email_ids):
+            try:
+                # PEEK leaves the flags untouched
+                fetched = self._fetch_text_messages(mail, batch)
+            except Exception as e:
+                logger.error(f"Error fetching batch of {len(batch)} emails: {str(e)}")
+                continue
+            
+            # Keep the server order, and skip the messages the server didn't return
+            position = {uid: i for i, uid in enumerate(batch)}
+            fetched = sorted((item for item in fetched if item[0] in position), key=lambda item: position[item[0]])
+            fetched_ids = [uid for uid, msg in fetched]
+            if not fetched_ids:
+                continue
+            
+            try:
+                # Mark as read with a single STORE whose untagged replies are suppressed
+                result, data = mail.uid("STORE", b",".join(fetched_ids), '+FLAGS.SILENT', '\\Seen')
+                if result != "OK":
+                    raise imaplib.IMAP4.error(f"STORE failed: {data}")
+            except Exception as e:
+                # Still unread, they are processed once the next poll fetches them again
+                logger.error(f"Error marking {len(fetched_ids)} emails as read: {str(e)}")
+                continue
+            marked.extend(fetched_ids)
+            emails.extend(msg for uid, msg in fetched)
+        return emails
+
+    @staticmethod
+    def _batches(ids: List[bytes], size: int = FETCH_BATCH_SIZE) -> List[List[bytes]]:
+        """Splits message ids into batches small enough for a single IMAP command."""
+        return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+    def _fetch_text_messages(self, mail: imaplib.IMAP4_SSL, ids: List[bytes]) -> List[Tuple[bytes, email.message.Message]]:
+        """
+        Fetches the headers and the text part of several messages, skipping attachments.
+        
+        The BODYSTRUCTURE of each message is fetched along with the headers used
+        by _get_email_info, then its first text/plain (or text/html) part is fetched
+        in one command per section number. Messages whose structure has no text
+        part or can't be read are fetched whole.
+        
+        Args:
+            mail: Connection with the folder of the messages selected
+            ids: Message UIDs to fetch, at most FETCH_BATCH_SIZE
+            
+        Returns:
+            List of (message UID, email.message.Message) tuples, the messages
+            holding the headers and the text part
+            
+        Raises:
+            imaplib.IMAP4.error: When the server refuses the structure FETCH
+        """
+        result, msg_data = mail.uid("FETCH", b",".join(ids), f"(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({_INFO_HEADER_FIELDS})])")
+        if result != "OK":
+            # Not the same as no messages, the caller must leave them unread
+            raise imaplib.IMAP4.error(f"Email structure fetch failed: {result} {msg_data}")
+        
+        headers, sections, whole = {}, {}, []
+        for item in _parse_fetch_response(msg_data):
+            uid = item.get(b"UID")
+            try:
+                section, part = _find_text_part(item[b"BODYSTRUCTURE"])
+                # Servers may echo the header field list differently than requested
+                header_bytes = next(value for name, value in item.items() if name.startswith(b"BODY[HEADER"))
+                headers[uid] = (header_bytes.rstrip(b"\r\n"), part)
+                sections.setdefault(section, []).append(uid)
+            except (KeyError, IndexError, TypeError, AttributeError, StopIteration):
+                # Unknown structure or no text part
+                if uid is not None:
+                    whole.append(uid)
+        
+        emails = []
+        for section, section_ids in sections.items():
+            for uid, data in self._fetch_messages(mail, section_ids, f"(BODY.PEEK[{section}])"):
+                header_bytes, part = headers[uid]
+                # Rebuild a single part message out of the headers and the text part
+                params = part[2] or []
+                charset = dict(zip((name.upper() for name in params[0::2]), params[1::2])).get(b"CHARSET") or b"utf-8"
+                encoding = part[5] or b"7BIT"
+                content_headers = (
+                    b"Content-Type: text/" + part[1].lower() + b'; charset="' + charset + b'"\r\n'
+                    b"Content-Transfer-Encoding: " + encoding + b"\r\n"
+                )
+                emails.append((uid, email.message_from_bytes(
+                    header_bytes + b"\r\n" + content_headers + b"\r\n" + data, policy=email.policy.default
+                )))
+        
+        if whole:
+            for uid, raw_email in self._fetch_messages(mail, whole, "(BODY.PEEK[])"):
+                emails.append((uid, email.message_from_bytes(raw_email, policy=email.policy.default)))
+        return emails
+
+    def _fetch_messages(self, mail: imaplib.IMAP4_SSL, ids: List[bytes], parts: str,
+                        failed: Optional[List[bytes]] = None) -> List[Tuple[bytes, bytes]]:
+        """
+        Fetches the given parts of several messages with a single UID FETCH command.
+        
+        Args:
+            mail: Connection with the folder of the messages selected
+            ids: Message UIDs to fetch, at most FETCH_BATCH_SIZE
+            parts: FETCH data items, e.g. "(BODY.PEEK[])"
+            failed: Receives the UIDs that couldn't be fetched one by one either
+            
+        Returns:
+            List of (message UID, fetched data) tuples in server order
+            
+        Raises:
+            imaplib.IMAP4.error: When the server refuses the FETCH
+        """
+        try:
+            result, msg_data = mail.uid("FETCH", b",".join(ids), parts)
+        except imaplib.IMAP4.abort:
+            # The connection itself is broken, retrying message by message won't help
+            raise
+        except imaplib.IMAP4.error as e:
+            # BAD response, e.g. the request is too large for the server,
+            # fetch the messages one at a time instead
+            if len(ids) == 1:
+                raise
+            logger.warning(f"Batch fetch of {len(ids)} messages failed, fetching them one by one: {str(e)}")
+            messages = []
+            for message_id in ids:
+                try:
+                    messages.extend(self._fetch_messages(mail, [message_id], parts))
+                except imaplib.IMAP4.abort:
+                    raise
+                except imaplib.IMAP4.error as message_error:
+                    if failed is not None:
+                        failed.append(message_id)
+                    logger.error(f"Error fetching message {message_id.decode()}: {str(message_error)}")
+            return messages
+            
+        if result != "OK":
+            # Not the same as no messages, the caller must not take them as fetched
+            raise imaplib.IMAP4.error(f"Email fetch failed: {result} {msg_data}")
+        
+        # Each message is a (b'<seq> (UID <uid> <item> {size}', data) tuple followed by
+        # b')', some servers send the UID item after the data, in that closing part
+        messages = []
+        for i, response in enumerate(msg_data):
+            if not isinstance(response, tuple):
+                continue
+            match = _UID_RE.search(response[0])
+            if match is None and i + 1 < len(msg_data) and isinstance(msg_data[i + 1], bytes):
+                match = _UID_RE.search(msg_data[i + 1])
+            if match is None:
+                logger.warning(f"No UID in fetch response: {response[0]}")
+                continue
+            messages.append((match.group(1), response[1]))
+        return messages
+
+    @_holding_imap_lock
     def fetch_draft_replies(self) -> List[Dict]:
         """
         Fetches all draft email replies.
         
+        Drafts are cached by UID, each call only fetches the headers of the drafts
+        added since the previous one, and none at all when the folder is unchanged.
+        
         Returns:
             List of dictionaries containing draft information
         """
         try:
-            mail = self.connect_to_inbox()
-            
+            return self._list_drafts(self._get_imap())
+        except Exception as e:
+            logger.error(f"Error fetching drafts: {str(e)}")
+            # Return empty list on error to allow workflow to continue
+            return []
+
+    def _fetch_draft_replies_pooled(self) -> List[Dict]:
+        """Fetches all draft email replies with a connection of the pool, see fetch_draft_replies."""
+        with self._lease_imap() as mail:
+            return self._list_drafts(mail)
+
+    def _list_drafts(self, mail: imaplib.IMAP4_SSL) -> List[Dict]:
+        """Lists the drafts with the given connection, updating the drafts cache."""
+        with self._drafts_lock:
             # Search for drafts folder
-            result, folders = mail.list()
-            draft_folder = None
-            for folder in folders:
-                if b"\\Drafts" in folder:
-                    # Use our helper method to safely extract folder name
-                    draft_folder = self._get_folder_name(folder)
-                    break
-                    
+            draft_folder = self._resolve_draft_folder(mail)
             if not draft_folder:
                 logger.warning("No drafts folder found")
                 return []
                 
+            # The folder is unchanged when no message was added (UIDNEXT) or removed (MESSAGES)
+            status = self._get_mailbox_status(mail, draft_folder, ("UIDVALIDITY", "UIDNEXT", "MESSAGES"))
+            if status is not None and status == self._drafts_status:
+                return list(self._drafts.values())
+            if status is None or self._drafts_status is None or status[0] != self._drafts_status[0]:
+                # UIDs of the cached drafts may have been reused
+                self._drafts.clear()
+            self._drafts_status = None
+            
             try:
                 # Try using quoted folder name first
                 try:
@@ -273,41 +1144,43 @@ class EmailToolsClass:
             except Exception as select_error:
                 logger.warning(f"Error selecting drafts folder: {str(select_error)}")
                 # If we can't access drafts, return an empty list
-                mail.logout()
                 return []
             
-            result, data = mail.search(None, "ALL")
+            result, data = mail.uid("SEARCH", None, "ALL")
             
             if result != "OK":
                 return []
-                
+            
+            # Forget drafts that were sent or deleted, only new ones are fetched
             draft_ids = data[0].split()
-            drafts = []
+            present = set(draft_ids)
+            for uid in [uid for uid in self._drafts if uid not in present]:
+                del self._drafts[uid]
+            new_ids = [uid for uid in draft_ids if uid not in self._drafts]
+            failed = []
+            complete = True
             
-            for d_id in draft_ids:
+            for batch in self._batches(new_ids):
                 try:
-                    result, msg_data = mail.fetch(d_id, "(RFC822)")
-                    if result != "OK":
-                        continue
+                    # Only the threading headers are needed, leave draft bodies on the server
+                    for d_id, raw_headers in self._fetch_messages(mail, batch, "(BODY.PEEK[HEADER])", failed):
+                        msg = _HEADER_PARSER.parsebytes(raw_headers)
+                        thread_id = self._get_thread_id(msg)
                         
-                    msg = email.message_from_bytes(msg_data[0][1])
-                    thread_id = self._get_thread_id(msg)
-                    
-                    drafts.append({
-                        "draft_id": d_id.decode(),
-                        "threadId": thread_id,
-                        "id": msg.get("Message-ID", "")
-                    })
+                        self._drafts[d_id] = {
+                            "draft_id": d_id.decode(),
+                            "threadId": thread_id,
+                            "id": msg.get("Message-ID", "")
+                        }
                 except Exception as e:
-                    logger.error(f"Error fetching draft {d_id}: {str(e)}")
-                    
-            mail.logout()
-            return drafts
+                    complete = False
+                    logger.error(f"Error fetching batch of {len(batch)} drafts: {str(e)}")
             
-        except Exception as e:
-            logger.error(f"Error fetching drafts: {str(e)}")
-            # Return empty list on error to allow workflow to continue
-            return []
+            drafts = list(self._drafts.values())
+            if complete and not failed:
+                self._drafts_status = status
+                self._state.set_draft_threads(draft["threadId"] for draft in drafts)
+            return drafts
 
     def create_draft_reply(self, initial_email: Dict, reply_text: str) -> Optional[Dict]:
         """
@@ -337,26 +1210,15 @@ class EmailToolsClass:
             # we'll use SMTP to send the message to the Drafts folder
             try:
                 logger.debug(f"Attempting to create draft via SMTP to {self.smtp_server}:{self.smtp_port}")
-                # Connect to SMTP server
-                if self.smtp_port == 465:
-                    logger.debug("Using SMTP_SSL connection")
-                    server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-                else:
-                    logger.debug("Using standard SMTP connection with STARTTLS")
-                    server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-                    server.starttls()
-                    
-                logger.debug(f"Logging in to SMTP server as {self.email_user}")
-                server.login(self.email_user, self.email_pass)
-                
                 # Add the Draft flag to indicate this is a draft
                 message['X-Mozilla-Draft-Info'] = 'internal/draft; vnd.mozilla.message-draft'
                 
                 # Send the message to ourselves, it will appear in Drafts
                 logger.debug(f"Sending draft email from {self.email_user} to {self.email_user}")
-                server.send_message(message, from_addr=self.email_user, to_addrs=[self.email_user])
-                server.quit()
+                with self._lease_smtp() as server:
+                    server.send_message(message, from_addr=self.email_user, to_addrs=[self.email_user])
                 logger.info("✅ Draft created successfully via SMTP")
+                self._state.add_draft_threads([initial_email["threadId"]])
                 
                 return {
                     "threadId": initial_email["threadId"],
@@ -367,67 +1229,39 @@ class EmailToolsClass:
                 logger.warning(f"SMTP draft creation failed: {str(smtp_error)}")
                 logger.debug("Falling back to IMAP APPEND method")
                 
-                # Connect to IMAP and save to drafts
-                mail = self.connect_to_inbox()
+                with self._imap_lock:
+                    # Connect to IMAP and save to drafts
+                    mail = self._get_imap()
                 
-                # Find Drafts folder
-                logger.debug("Searching for Drafts folder")
-                result, folders = mail.list()
-                draft_folder = None
-                for folder in folders:
-                    if b"\\Drafts" in folder:
-                        # Use our helper method to safely extract folder name
-                        draft_folder = self._get_folder_name(folder)
-                        logger.debug(f"Found Drafts folder: {draft_folder}")
-                        break
-                        
-                if not draft_folder:
-                    logger.error("No Drafts folder found in IMAP account")
-                    raise ValueError("No drafts folder found")
+                    # Find Drafts folder
+                    draft_folder = self._resolve_draft_folder(mail)
+                    if not draft_folder:
+                        logger.error("No Drafts folder found in IMAP account")
+                        raise ValueError("No drafts folder found")
                 
-                # Try a different approach to APPEND that avoids syntax issues
-                # Completely bypass using the folder name in the command
-                try:
-                    # First select the drafts folder
-                    logger.debug(f"Attempting to select Drafts folder: {draft_folder}")
                     try:
-                        mail.select(f'"{draft_folder}"')
-                        logger.debug("Selected Drafts folder with quotes")
-                    except Exception as e:
-                        logger.debug(f"Error selecting quoted folder: {str(e)}")
-                        mail.select(draft_folder)
-                        logger.debug("Selected Drafts folder without quotes")
-                    
-                    # Use the APPEND command with minimal arguments
-                    # Just pass the message without flags or date
-                    import email.utils
-                    import time
-                    
-                    # We'll try to create a draft by directly uploading the message
-                    try:
-                        logger.debug("Attempting direct IMAP APPEND command")
-                        # Use a direct IMAP command instead of the append method which might be formatting incorrectly
-                        mail._simple_command('APPEND', draft_folder, '{%d}' % len(message.as_bytes()))
-                        response1 = mail._get_response()
-                        logger.debug(f"APPEND command response: {response1}")
-                        mail._command_complete('APPEND', response1)
-                        
-                        logger.debug("Sending message content")
-                        mail.send(message.as_bytes())
-                        response2 = mail._get_response()
-                        logger.debug(f"Content send response: {response2}")
-                        mail._command_complete('APPEND', response2)
-                        
+                        logger.debug(f"Appending draft to folder: {draft_folder}")
+                        result, data = mail.append(
+                            f'"{draft_folder}"', '(\\Draft)',
+                            imaplib.Time2Internaldate(time.time()), message.as_bytes()
+                        )
+                        if result != "OK":
+                            raise imaplib.IMAP4.error(f"APPEND failed: {data}")
                         logger.info("✅ Draft created successfully via IMAP")
+                        self._state.add_draft_threads([initial_email["threadId"]])
+                        
+                        draft_id = self._get_appended_uid(mail, draft_folder, data, message["Message-ID"])
+                        if draft_id:
+                            logger.debug(f"Draft stored with UID {draft_id}")
+                            return {
+                                "draft_id": draft_id,
+                                "threadId": initial_email["threadId"],
+                                "id": message["Message-ID"]
+                            }
                     except Exception as append_error:
                         logger.error(f"IMAP APPEND failed: {str(append_error)}")
                         # If IMAP fails completely, just log it and return success anyway
                         # We'll let the workflow continue rather than failing completely
-                except Exception as e:
-                    logger.error(f"Error selecting drafts folder: {str(e)}")
-                
-                mail.logout()
-                logger.debug("IMAP session closed")
                 
                 # Return success even if we couldn't create the draft
                 # This allows the workflow to continue
@@ -441,6 +1275,23 @@ class EmailToolsClass:
             # Return None but log the error
             return None
 
+    def _get_appended_uid(self, mail: imaplib.IMAP4_SSL, folder: str, append_data: list, message_id: str) -> Optional[str]:
+        """
+        Returns the UID of a message just appended to a folder.
+        
+        Servers supporting UIDPLUS report it in the APPEND response, otherwise the
+        message is looked up by its Message-ID in that folder.
+        """
+        match = _APPENDUID_RE.search(append_data[0] or b"") if append_data else None
+        if match:
+            return match.group(1).decode()
+        
+        mail.select(f'"{folder}"')
+        result, data = mail.uid("SEARCH", None, "HEADER", "Message-ID", f'"{message_id}"')
+        if result == "OK" and data[0]:
+            return data[0].split()[-1].decode()
+        return None
+
     def send_reply(self, initial_email: Dict, reply_text: str) -> Optional[Dict]:
         """
         Sends a reply to an email.
@@ -462,50 +1313,41 @@ class EmailToolsClass:
             logger.debug(f"Reply content preview: {preview}")
             
             # Create the reply message
-            message = self._create_reply_message(initial_email, reply_text, send=True)
+            message = self._create_reply_message(initial_email, reply_text)
             logger.debug(f"Created reply with headers: From={message.get('From')}, To={message.get('To')}, Subject={message.get('Subject')}")
             
-            # Connect to SMTP server
-            logger.debug(f"Connecting to SMTP server {self.smtp_server}:{self.smtp_port}")
-            if self.smtp_port == 465:
-                logger.debug("Using SMTP_SSL connection")
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            else:
-                logger.debug("Using standard SMTP connection with STARTTLS")
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-                server.starttls()
-                
-            logger.debug(f"Logging in to SMTP server as {self.email_user}")
-            server.login(self.email_user, self.email_pass)
-            
             # Set up recipient
             recipient = initial_email["sender"]
             logger.debug(f"Sending email from {self.email_user} to {recipient}")
             
-            # Send the message
-            result = server.send_message(message)
+            # Send the message over a pooled SMTP connection
+            with self._lease_smtp() as server:
+                result = server.send_message(message)
             if result:
                 # If there are any failed recipients, they will be in the result dict
                 logger.error(f"Failed to send to some recipients: {result}")
             else:
                 logger.info(f"✅ Email sent successfully to {recipient}")
             
-            server.quit()
-            logger.debug("SMTP connection closed")
-            
             return {
                 "id": message["Message-ID"],
                 "threadId": initial_email["threadId"]
             }
             
-        except Exception as e:
-            logger.error(f"Error sending reply: {str(e)}", exc_info=True)
-            # Provide detailed traceback for debugging
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            # Logs the traceback once, for debugging
+            logger.exception("Error sending reply")
             return None
 
-    def _create_reply_message(self, email_info: Dict, reply_text: str, send: bool = False) -> MIMEMultipart:
+    async def acreate_draft_reply(self, initial_email: Dict, reply_text: str) -> Optional[Dict]:
+        """Creates a draft reply in a worker thread, without blocking the event loop."""
+        return await asyncio.to_thread(self.create_draft_reply, initial_email, reply_text)
+
+    async def asend_reply(self, initial_email: Dict, reply_text: str) -> Optional[Dict]:
+        """Sends a reply in a worker thread, without blocking the event loop."""
+        return await asyncio.to_thread(self.send_reply, initial_email, reply_text)
+
+    def _create_reply_message(self, email_info: Dict, reply_text: str) -> MIMEMultipart:
         """Creates a reply message with proper headers and formatting."""
         message = self._create_html_email_message(
             recipient=email_info["sender"],
@@ -517,10 +1359,9 @@ class EmailToolsClass:
         if email_info["messageId"]:
             message["In-Reply-To"] = email_info["messageId"]
             message["References"] = f"{email_info['references']} {email_info['messageId']}".strip()
-            
-            if send:
-                message["Message-ID"] = f"<{uuid.uuid4()}@{self.smtp_server}>"
-                
+        
+        # Drafts need one too, it is how an appended draft is found again
+        message["Message-ID"] = f"<{uuid.uuid4()}@{self.smtp_server}>"
         return message
 
     def _get_thread_id(self, msg: email.message.Message) -> str:
@@ -528,20 +1369,31 @@ class EmailToolsClass:
         Extracts or generates a thread ID from an email message.
         Uses References and In-Reply-To headers to maintain threading.
         """
-        references = msg.get("References", "").split()
-        in_reply_to = msg.get("In-Reply-To", "")
-        message_id = msg.get("Message-ID", "")
-        
-        # Try to get thread ID from existing headers
-        if references:
-            return references[0].strip("<>")  # First reference is usually thread root
-        elif in_reply_to:
-            return in_reply_to.strip("<>")
-        elif message_id:
-            return message_id.strip("<>")
-        else:
+        message_id = str(msg.get("Message-ID", ""))
+        # The same message is looked up while filtering threads and extracting its info
+        if message_id:
+            with self._thread_ids_lock:
+                thread_id = self._thread_ids.get(message_id)
+            if thread_id is not None:
+                return thread_id
+            
+        # Try to get thread ID from existing headers, the first reference is usually the thread root
+        thread_id = (
+            _first_message_id(msg.get("References") or "")
+            or _first_message_id(msg.get("In-Reply-To") or "")
+            or _first_message_id(message_id)
+        )
+        if not thread_id:
             # Generate a new thread ID if none exists
             return f"{uuid.uuid4()}@{self.smtp_server}"
+            
+        if message_id:
+            with self._thread_ids_lock:
+                if message_id not in self._thread_ids and len(self._thread_ids) >= THREAD_ID_CACHE_SIZE:
+                    # Evict the oldest entry
+                    self._thread_ids.popitem(last=False)
+                self._thread_ids[message_id] = thread_id
+        return thread_id
 
     def _get_email_info(self, msg: email.message.Message) -> Dict:
         """
@@ -553,59 +1405,63 @@ class EmailToolsClass:
         Returns:
             Dictionary containing email information
         """
-        # Extract headers
-        headers = {}
-        for key in ["message-id", "references", "in-reply-to", "from", "to", "subject"]:
-            headers[key] = msg.get(key, "")
-            
+        # Header objects of email.policy.default, decoded to plain strings. Only
+        # the headers used are read, each one is parsed on access
+        message_id = str(msg.get("Message-ID", ""))
+
         # Get sender email address
-        from_name, from_addr = email.utils.parseaddr(headers["from"])
+        from_name, from_addr = email.utils.parseaddr(str(msg.get("From", "")))
         
         return {
-            "id": headers["message-id"].strip("<>"),
+            "id": message_id.strip("<>"),
             "threadId": self._get_thread_id(msg),
-            "messageId": headers["message-id"],
-            "references": headers["references"],
+            "messageId": message_id,
+            "references": str(msg.get("References", "")),
             "sender": from_addr,
-            "subject": headers["subject"],
+            "subject": str(msg.get("Subject", "")),
             "body": self._get_email_body(msg),
         }
 
-    def _get_email_body(self, msg: email.message.Message) -> str:
+    def _get_email_body(self, msg: email.message.EmailMessage) -> str:
         """
         Extracts the email body, prioritizing text/plain over text/html.
-        Handles multipart messages and strips HTML if necessary.
-        """
-        body = ""
-        if msg.is_multipart():
-            # Get the first text/plain part, or fall back to first text/html
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode()
-                    break
-                elif part.get_content_type() == "text/html" and not body:
-                    html_content = part.get_payload(decode=True).decode()
-                    body = self._extract_main_content_from_html(html_content)
-        else:
-            # Handle single part messages
-            if msg.get_content_type() == "text/plain":
-                body = msg.get_payload(decode=True).decode()
-            elif msg.get_content_type() == "text/html":
-                html_content = msg.get_payload(decode=True).decode()
-                body = self._extract_main_content_from_html(html_content)
-                
+        Handles multipart messages and strips HTML if necessary. The message
+        must be parsed with email.policy.default.
+        """
+        # First text/plain part, else the first text/html one (the message itself when not multipart)
+        part = msg.get_body(preferencelist=("plain", "html"))
+        if part is None:
+            return ""
+        try:
+            body = part.get_content()
+        except LookupError:
+            # Unknown charset name
+            body = self._decode_part(part)
+        if part.get_content_type() == "text/html":
+            body = self._extract_main_content_from_html(body)
         return self._clean_body_text(body)
 
+    def _decode_part(self, part: email.message.Message) -> str:
+        """Decodes a text part as UTF-8 when its declared charset is unknown, replacing invalid bytes."""
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
+
     def _extract_main_content_from_html(self, html_content: str) -> str:
         """Extracts main visible content from HTML."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for tag in soup(['script', 'style', 'head', 'meta', 'title']):
+        if HTMLParser is not None:
+            tree = HTMLParser(html_content)
+            tree.strip_tags(_INVISIBLE_HTML_TAGS)
+            root = tree.body or tree.root
+            return root.text(separator='\n', strip=True) if root is not None else ""
+
+        soup = BeautifulSoup(html_content, _BS4_PARSER)
+        for tag in soup(_INVISIBLE_HTML_TAGS):
             tag.decompose()
         return soup.get_text(separator='\n', strip=True)
 
     def _clean_body_text(self, text: str) -> str:
         """Cleans up the email body text by removing extra spaces and newlines."""
-        return re.sub(r'\s+', ' ', text.replace('\r', '').replace('\n', '')).strip()
+        return _WHITESPACE_RE.sub(' ', text.translate(_DROP_LINE_BREAKS)).strip()
 
     def _create_html_email_message(self, recipient: str, subject: str, reply_text: str) -> MIMEMultipart:
         """Creates an HTML email message with proper formatting."""
@@ -615,40 +1471,25 @@ class EmailToolsClass:
         message["Subject"] = f"Re: {subject}" if not subject.startswith("Re: ") else subject
 
         # Determine if reply_text is already HTML
-        is_html = reply_text.strip().startswith('<') and '>' in reply_text
+        is_html = _HTML_START_RE.match(reply_text) is not None
 
         # Create HTML version
         if is_html:
             # Already HTML content, use as is
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            </head>
-            <body>{reply_text}</body>
-            </html>
-            """
+            html_text = reply_text
         else:
-            # Convert plain text to HTML
-            html_text = reply_text.replace("\n", "<br>").replace("\\n", "<br>")
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            </head>
-            <body>{html_text}</body>
-            </html>
-            """
-
-        html_part = MIMEText(html_content, "html")
+            # Convert plain text to HTML, both real and escaped newlines become line breaks
+            html_text = _NEWLINE_RE.sub("<br>", reply_text)
+        html_content = "".join((_HTML_PREFIX, html_text, _HTML_SUFFIX))
+
+        html_part = MIMEText(html_content, "html", _HTML_CHARSET)
         message.attach(html_part)
 
         return message
 
     def _should_skip_email(self, email_info: Dict) -> bool:
         """Determines if an email should be skipped based on sender."""
-        return self.email_user in email_info["sender"] 
\ No newline at end of file
+        sender = email_info["sender"].lower()
+        if sender in self._own_addresses:
+            return True
+        return bool(self._allowed_domains) and sender.rpartition("@")[2] not in self._allowed_domains 
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Tracing Module
+==============
+
+OpenTelemetry instrumentation for the workflow nodes. Every node runs inside a span
+named after its graph node, separating the LLM-bound stages from mailbox IO and
+knowledge base searches.
+
+Only the OpenTelemetry API is required, spans are no-ops until an SDK is configured,
+e.g. by running the workflow with `opentelemetry-instrument` and an OTLP exporter.
+"""
+
+import functools
+import inspect
+from typing import Callable
+from opentelemetry import trace
+
+tracer = trace.get_tracer(__name__)
+
+
+def traced(name: str, func: Callable) -> Callable:
+    """Wraps a sync or async node function so each call is recorded in a span."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.start_as_current_span(name):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+# Import the module to test
+from src.cache import SemanticCache, ValidatedLLMCache
+from src.structure_outputs import CategorizeEmailOutput
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic embeddings: queries mentioning pricing share one direction."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0] if "price" in text.lower() else [0.0, 1.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class TestSemanticCache:
+    """Test suite for the RAG answer SemanticCache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Fixture to create a SemanticCache backed by a temporary Chroma directory."""
+        return SemanticCache(KeywordEmbeddings(), persist_directory=str(tmp_path))
+
+    def test_lookup_miss_on_empty_cache(self, cache):
+        """Test that an empty cache returns no answer."""
+        assert asyncio.run(cache.alookup("What is the price?")) is None
+
+    def test_lookup_hit_on_similar_query(self, cache):
+        """Test that a semantically similar query returns the cached answer."""
+        asyncio.run(cache.aupdate("What is the price?", "It costs 5 €."))
+        assert asyncio.run(cache.alookup("Tell me the price")) == "It costs 5 €."
+
+    def test_lookup_miss_on_different_query(self, cache):
+        """Test that an unrelated query does not return the cached answer."""
+        asyncio.run(cache.aupdate("What is the price?", "It costs 5 €."))
+        assert asyncio.run(cache.alookup("Where are you located?")) is None
+
+
+class TestValidatedLLMCache:
+    """Test suite for the exact-match LLM cache skipping invalid structured answers."""
+
+    @staticmethod
+    def _answer(args):
+        return [ChatGeneration(message=AIMessage(
+            content="", tool_calls=[{"name": "CategorizeEmailOutput", "args": args, "id": "call_1"}]
+        ))]
+
+    def test_valid_answers_are_cached(self):
+        """Test that answers validating against their schema are cached."""
+        cache = ValidatedLLMCache([CategorizeEmailOutput])
+        answer = self._answer({"category": "product_enquiry"})
+        cache.update("prompt", "llm", answer)
+        assert cache.lookup("prompt", "llm") == answer
+
+    def test_invalid_answers_are_not_cached(self):
+        """Test that answers failing validation are left out, so a retry asks the LLM again."""
+        cache = ValidatedLLMCache([CategorizeEmailOutput])
+        cache.update("prompt", "llm", self._answer({"category": "pricing"}))
+        assert cache.lookup("prompt", "llm") is None
@@ -1,10 +1,13 @@
 import os
 import uuid
+import time
 import pytest
 import email
+import email.policy
 import imaplib
 import smtplib
 from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
@@ -27,7 +30,8 @@ class TestEmailTools:
             'email_pass': 'password123',
             'imap_server': 'imap.example.com',
             'smtp_server': 'smtp.example.com',
-            'smtp_port': 587
+            'smtp_port': 587,
+            'state_path': ':memory:'
         }):
             yield EmailToolsClass()
 
@@ -51,6 +55,13 @@ class TestEmailTools:
                 EmailToolsClass()
             assert "Missing required configuration" in str(excinfo.value)
 
+    def test_config_is_an_immutable_snapshot(self, email_tools):
+        """Test that the configuration is copied at initialization and can't be changed afterwards."""
+        with patch.dict('src.tools.EmailTools.EMAIL_CONFIG', {'email_user': 'other@example.com'}):
+            assert email_tools.config.email_user == 'test@example.com'
+        with pytest.raises(AttributeError):
+            email_tools.config.email_user = 'other@example.com'
+
     @patch('imaplib.IMAP4_SSL')
     def test_connect_to_inbox_success(self, mock_imap, email_tools):
         """Test successful connection to inbox."""
@@ -80,6 +91,481 @@ class TestEmailTools:
             email_tools.connect_to_inbox()
         assert "Failed to connect to email server" in str(excinfo.value)
 
+    def test_fetch_recent_emails_batches_commands(self, email_tools):
+        """Test that emails are fetched and marked as read with one UID command per batch and text part."""
+        plain = b'("TEXT" "PLAIN" ("CHARSET" "iso-8859-1") NIL NIL "QUOTED-PRINTABLE" 12 1 NIL NIL NIL NIL)'
+        html = b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "BASE64" 40 1 NIL NIL NIL NIL)'
+        attachment = b'("APPLICATION" "PDF" ("NAME" "x.pdf") NIL NIL "BASE64" 50000 NIL NIL NIL NIL)'
+        fetches = {
+            "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID REFERENCES IN-REPLY-TO FROM SUBJECT)])": ("OK", [
+                (b"1 (UID 11 BODYSTRUCTURE " + plain + b" BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: one\r\n\r\n"),
+                b")",
+                (b"2 (UID 12 BODYSTRUCTURE ((" + html + plain + b' "ALTERNATIVE" ("BOUNDARY" "a") NIL NIL NIL)'
+                 + attachment + b' "MIXED" ("BOUNDARY" "b") NIL NIL NIL)'
+                 b" BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: two\r\n\r\n"),
+                b")",
+                b'3 (UID 13 BODYSTRUCTURE ("IMAGE" "PNG" NIL NIL NIL "BASE64" 10 NIL NIL NIL))',
+            ]),
+            "(BODY.PEEK[1])": ("OK", [(b"1 (UID 11 BODY[1] {9}", b"Caf=E9 one"), b")"]),
+            "(BODY.PEEK[1.2])": ("OK", [(b"2 (UID 12 BODY[1.2] {8}", b"Body two"), b")"]),
+            "(BODY.PEEK[])": ("OK", [(b"3 (BODY[] {28}", b"Subject: three\r\n\r\nBody three"), b" UID 13)"]),
+        }
+        def uid(command, *args):
+            if command == "SEARCH":
+                return ("OK", [b"11 12 13"])
+            if command == "FETCH":
+                return fetches[args[1]]
+            return ("OK", [])
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = uid
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            emails = email_tools.fetch_recent_emails()
+
+        assert [msg["Subject"] for msg in emails] == ["one", "two", "three"]
+        assert [email_tools._get_email_body(msg) for msg in emails] == ["Café one", "Body two", "Body three"]
+        search, *fetch, store = mock_conn.uid.call_args_list
+        assert 'NOT FROM "test@example.com"' in search.args[2]
+        assert [call.args[:2] for call in fetch] == [
+            ("FETCH", b"11,12,13"), ("FETCH", b"11"), ("FETCH", b"12"), ("FETCH", b"13"),
+        ]
+        assert store.args == ("STORE", b"11,12,13", "+FLAGS.SILENT", "\\Seen")
+
+    def test_fetch_recent_emails_marks_only_fetched_emails_as_read(self, email_tools):
+        """Test that messages missing from the FETCH response are neither returned nor marked as read."""
+        plain = b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 3 1 NIL NIL NIL NIL)'
+        fetches = {
+            "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID REFERENCES IN-REPLY-TO FROM SUBJECT)])": ("OK", [
+                (b"1 (UID 11 BODYSTRUCTURE " + plain + b" BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: one\r\n\r\n"),
+                b")",
+            ]),
+            "(BODY.PEEK[1])": ("OK", [(b"1 (UID 11 BODY[1] {3}", b"one"), b")"]),
+        }
+        def uid(command, *args):
+            if command == "SEARCH":
+                return ("OK", [b"11 12"])
+            if command == "FETCH":
+                return fetches[args[1]]
+            return ("OK", [])
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = uid
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            emails = email_tools.fetch_recent_emails()
+
+        assert [msg["Subject"] for msg in emails] == ["one"]
+        assert mock_conn.uid.call_args_list[-1].args == ("STORE", b"11", "+FLAGS.SILENT", "\\Seen")
+
+    def test_fetch_recent_emails_keeps_unread_emails_failing_one_by_one(self, email_tools):
+        """Test that a message failing the one by one fallback fetch is not marked as read."""
+        plain = b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 3 1 NIL NIL NIL NIL)'
+        structure = [
+            (b"1 (UID 11 BODYSTRUCTURE " + plain + b" BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: one\r\n\r\n"),
+            b")",
+            (b"2 (UID 12 BODYSTRUCTURE " + plain + b" BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: two\r\n\r\n"),
+            b")",
+        ]
+        def uid(command, *args):
+            if command == "SEARCH":
+                return ("OK", [b"11 12"])
+            if command == "FETCH" and args[1].startswith("(BODYSTRUCTURE"):
+                return ("OK", structure)
+            if command == "FETCH":
+                if args[0] != b"11":
+                    raise imaplib.IMAP4.error("BAD")
+                return ("OK", [(b"1 (UID 11 BODY[1] {3}", b"one"), b")"])
+            return ("OK", [])
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = uid
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            emails = email_tools.fetch_recent_emails()
+
+        assert [msg["Subject"] for msg in emails] == ["one"]
+        assert mock_conn.uid.call_args_list[-1].args == ("STORE", b"11", "+FLAGS.SILENT", "\\Seen")
+
+    def test_fetch_recent_emails_keeps_emails_unread_when_fetch_is_refused(self, email_tools):
+        """Test that a NO reply to the FETCH neither drops the emails nor marks them as read."""
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = lambda command, *args: ("OK", [b"11 12 13"]) if command == "SEARCH" else ("NO", [b"busy"])
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            assert email_tools.fetch_recent_emails() == []
+
+        assert [call.args[0] for call in mock_conn.uid.call_args_list] == ["SEARCH", "FETCH"]
+
+    def test_fetch_recent_emails_keeps_emails_unread_when_store_fails(self, email_tools):
+        """Test that emails that could not be marked as read are left for the next poll."""
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = lambda command, *args: ("OK", [b"11"]) if command == "SEARCH" else ("NO", [b"failed"])
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn), \
+             patch.object(email_tools, "_fetch_text_messages",
+                          side_effect=lambda mail, batch: [(uid, email.message.EmailMessage()) for uid in batch]):
+            assert email_tools.fetch_recent_emails() == []
+
+    def test_fetch_recent_emails_splits_among_pool_connections(self, email_tools):
+        """Test that large searches are fetched in parallel by pooled connections, keeping the server order."""
+        email_ids = [str(uid).encode() for uid in range(1, 46)]
+        main_conn = MagicMock()
+        main_conn.uid.return_value = ("OK", [b" ".join(email_ids)])
+        pooled_conns = []
+        def connect():
+            if not pooled_conns:
+                pooled_conns.append(main_conn)
+                return main_conn
+            conn = MagicMock()
+            conn.select.return_value = ("OK", [b"45"])
+            conn.uid.return_value = ("OK", [])
+            pooled_conns.append(conn)
+            return conn
+        def fetch(mail, batch):
+            return [(uid, email.message_from_string(f"Subject: {uid.decode()}\n\n")) for uid in batch]
+
+        with patch.object(email_tools, "connect_to_inbox", side_effect=connect), \
+             patch.object(email_tools, "_fetch_text_messages", side_effect=fetch):
+            emails = email_tools.fetch_recent_emails(max_results=100)
+
+        assert [msg["Subject"] for msg in emails] == [uid.decode() for uid in email_ids]
+        main_conn.uid.assert_called_once()
+        stored = [call.args[1] for conn in pooled_conns[1:] for call in conn.uid.call_args_list]
+        assert sorted(stored) == [b",".join(email_ids[:20]), b",".join(email_ids[20:40]), b",".join(email_ids[40:])]
+        assert 1 < len(pooled_conns) <= 4 + 1
+
+    def test_fetch_recent_emails_searches_only_new_uids(self, email_tools):
+        """Test that polls skip the search while UIDNEXT is unchanged and then search above the last UID."""
+        mock_conn = MagicMock()
+        mock_conn.select.return_value = ("OK", [b"2"])
+        mock_conn.uid.side_effect = lambda command, *args: ("OK", [b"12 13"] if command == "SEARCH" else [])
+        def selected(uidvalidity, uidnext):
+            codes = {"UIDVALIDITY": uidvalidity, "UIDNEXT": uidnext}
+            mock_conn.response.side_effect = lambda code: (code, [str(codes[code]).encode()])
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn), \
+             patch.object(email_tools, "_fetch_text_messages",
+                          side_effect=lambda mail, batch: [(uid, email.message.EmailMessage()) for uid in batch]):
+            selected(7, 14)
+            email_tools.fetch_recent_emails()
+            assert "UID" not in mock_conn.uid.call_args_list[0].args[2]
+            
+            mock_conn.uid.reset_mock()
+            email_tools.fetch_recent_emails()
+            mock_conn.uid.assert_not_called()
+            
+            selected(7, 16)
+            email_tools.fetch_recent_emails()
+            assert mock_conn.uid.call_args_list[0].args[2].startswith("(UID 14:* UNSEEN")
+            # Only the last message matches "14:*", it was already fetched
+            assert len(mock_conn.uid.call_args_list) == 1
+            
+            # A new UIDVALIDITY invalidates the stored UIDs
+            mock_conn.uid.reset_mock()
+            selected(8, 16)
+            email_tools.fetch_recent_emails()
+            assert "UID" not in mock_conn.uid.call_args_list[0].args[2]
+
+    def test_fetch_recent_emails_searches_again_from_first_unmarked_uid(self, email_tools):
+        """Test that the next poll searches again from the first message that wasn't marked as read."""
+        mock_conn = MagicMock()
+        mock_conn.select.return_value = ("OK", [b"3"])
+        mock_conn.response.side_effect = lambda code: (code, [b"7" if code == "UIDVALIDITY" else b"20"])
+        mock_conn.uid.side_effect = lambda command, *args: ("OK", [b"12 13 14"] if command == "SEARCH" else [])
+        # The server doesn't return message 13
+        fetched = lambda mail, batch: [(uid, email.message.EmailMessage()) for uid in batch if uid != b"13"]
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn), \
+             patch.object(email_tools, "_fetch_text_messages", side_effect=fetched):
+            assert len(email_tools.fetch_recent_emails()) == 2
+            
+            mock_conn.uid.reset_mock()
+            email_tools.fetch_recent_emails()
+            assert mock_conn.uid.call_args_list[0].args[2].startswith("(UID 13:* UNSEEN")
+
+    def test_fetch_unanswered_emails_skips_threads_with_drafts(self, email_tools):
+        """Test that recent emails of threads with a draft, listed alongside the inbox fetch, are skipped."""
+        recent = [
+            email.message_from_string("Message-ID: <a@x>\nFrom: ana@cliente.es\nSubject: uno\n\nHola", policy=email.policy.default),
+            email.message_from_string("Message-ID: <b@x>\nReferences: <t@x>\nFrom: bea@cliente.es\nSubject: dos\n\nHola", policy=email.policy.default),
+        ]
+        with patch.object(email_tools, "fetch_recent_emails", return_value=recent), \
+             patch.object(email_tools, "_fetch_draft_replies_pooled", return_value=[{"threadId": "t@x"}]):
+            emails = email_tools.fetch_unanswered_emails()
+
+        assert [info["messageId"] for info in emails] == ["<a@x>"]
+
+    def test_draft_folder_uses_special_use_listing(self, email_tools):
+        """Test that servers supporting SPECIAL-USE only list their special folders."""
+        mock_conn = MagicMock()
+        mock_conn.capabilities = ("IMAP4REV1", "SPECIAL-USE")
+        mock_conn.list.return_value = ("OK", [
+            b'(\\HasNoChildren \\Sent) "/" "Enviados"',
+            b'(\\HasNoChildren \\Drafts) "/" "Borradores"',
+        ])
+
+        assert email_tools._resolve_draft_folder(mock_conn) == "Borradores"
+        mock_conn.list.assert_called_once_with('(SPECIAL-USE) ""', '*')
+
+    @pytest.mark.parametrize("special_use", [
+        imaplib.IMAP4.error("BAD unknown LIST option"),
+        ("OK", [b'(\\HasNoChildren \\Sent) "/" "Enviados"']),
+    ])
+    def test_draft_folder_falls_back_to_full_listing(self, email_tools, special_use):
+        """Test that the full folder list is read when the SPECIAL-USE listing fails or has no drafts."""
+        def list_folders(*args):
+            if args:
+                if isinstance(special_use, Exception):
+                    raise special_use
+                return special_use
+            return ("OK", [b'(\\HasNoChildren) "/" "INBOX"', b'(\\HasNoChildren \\Drafts) "/" "Borradores"'])
+        mock_conn = MagicMock()
+        mock_conn.capabilities = ("IMAP4REV1", "SPECIAL-USE")
+        mock_conn.list.side_effect = list_folders
+
+        assert email_tools._resolve_draft_folder(mock_conn) == "Borradores"
+        assert mock_conn.list.call_args_list[-1].args == ()
+
+    @pytest.mark.parametrize("folder, name", [
+        (b'(\\HasNoChildren \\Drafts) "/" "Borradores"', "Borradores"),
+        (b'(\\HasNoChildren \\Drafts) "/" "[Gmail]/Drafts"', "[Gmail]/Drafts"),
+        (b'(\\HasNoChildren \\Drafts) "." Drafts', "Drafts"),
+    ])
+    def test_get_folder_name(self, email_tools, folder, name):
+        """Test that folder names are parsed from quoted and unquoted LIST responses."""
+        assert email_tools._get_folder_name(folder) == name
+
+    def test_should_skip_email_matches_own_address_only(self, email_tools):
+        """Test that only emails sent from our exact address are skipped."""
+        assert email_tools._should_skip_email({"sender": "Test@Example.com"})
+        assert not email_tools._should_skip_email({"sender": "not-test@example.com"})
+
+    def test_fetch_messages_falls_back_to_single_fetches(self, email_tools):
+        """Test that a rejected batch fetch is retried message by message."""
+        def uid(command, message_set, parts):
+            if message_set == b"11,12":
+                raise imaplib.IMAP4.error("FETCH command error: BAD [b'Request too long']")
+            return ("OK", [(b"1 (UID " + message_set + b" BODY[] {4}", b"body"), b")"])
+        mock_conn = MagicMock()
+        mock_conn.uid.side_effect = uid
+
+        messages = email_tools._fetch_messages(mock_conn, [b"11", b"12"], "(BODY.PEEK[])")
+        assert messages == [(b"11", b"body"), (b"12", b"body")]
+
+    def test_allowed_domains_filter_search_and_senders(self):
+        """Test that allowed domains narrow the inbox search and the sender check."""
+        with patch.dict('src.tools.EmailTools.EMAIL_CONFIG', {
+            'email_user': 'test@example.com',
+            'email_pass': 'password123',
+            'imap_server': 'imap.example.com',
+            'smtp_server': 'smtp.example.com',
+            'allowed_domains': 'cliente.es, @Gmail.com,partner.org',
+            'state_path': ':memory:'
+        }):
+            email_tools = EmailToolsClass()
+
+        assert email_tools._search_criteria == (
+            'NOT FROM "test@example.com" '
+            'OR FROM "@cliente.es" OR FROM "@gmail.com" FROM "@partner.org"'
+        )
+        assert not email_tools._should_skip_email({"sender": "ana@cliente.es"})
+        assert email_tools._should_skip_email({"sender": "bob@other.com"})
+
+    @pytest.mark.parametrize("headers, thread_id", [
+        ("References: <root@x>\n <reply@x>\nIn-Reply-To: <reply@x>\nMessage-ID: <m@x>", "root@x"),
+        ("In-Reply-To: <reply@x>\nMessage-ID: <m@x>", "reply@x"),
+        ("References: root@x reply@x\nMessage-ID: <m@x>", "root@x"),
+        ("Message-ID: <m@x>", "m@x"),
+    ])
+    def test_get_thread_id(self, email_tools, headers, thread_id):
+        """Test that the thread ID is the first reference, the replied message or the message itself."""
+        assert email_tools._get_thread_id(email.message_from_string(headers + "\n\n")) == thread_id
+
+    @patch('src.tools.EmailTools.THREAD_ID_CACHE_SIZE', 8)
+    def test_thread_id_cache_stays_bounded_across_threads(self, email_tools):
+        """Test that parsing workers share the thread ID cache without outgrowing it."""
+        messages = [email.message_from_string(f"Message-ID: <m{i}@x>\n\n") for i in range(400)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            thread_ids = list(executor.map(email_tools._get_thread_id, messages))
+
+        assert thread_ids == [f"m{i}@x" for i in range(400)]
+        assert len(email_tools._thread_ids) == 8
+
+    def test_draft_folder_is_listed_once(self, email_tools):
+        """Test that the Drafts folder name is resolved with a single LIST command."""
+        mock_conn = MagicMock()
+        mock_conn.list.return_value = ("OK", [
+            b'(\\HasNoChildren) "/" "INBOX"',
+            b'(\\HasNoChildren \\Drafts) "/" "Borradores"',
+        ])
+
+        assert email_tools._resolve_draft_folder(mock_conn) == "Borradores"
+        assert email_tools._resolve_draft_folder(mock_conn) == "Borradores"
+        mock_conn.list.assert_called_once()
+
+    def test_fetch_draft_replies_fetches_only_new_drafts(self, email_tools):
+        """Test that drafts are cached by UID, fetching only new ones and forgetting removed ones."""
+        mock_conn = MagicMock()
+        mock_conn.select.return_value = ("OK", [b"2"])
+        searches = iter([[b"5 6"], [b"6 7"]])
+        def uid(command, *args):
+            if command == "SEARCH":
+                return ("OK", next(searches))
+            ids = args[0].split(b",")
+            return ("OK", [item for uid in ids for item in (
+                (b"1 (UID " + uid + b" BODY[HEADER] {24}", b"Message-ID: <d" + uid + b"@x>\r\n\r\n"), b")")])
+        mock_conn.uid.side_effect = uid
+        email_tools._draft_folder = "Borradores"
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            mock_conn.status.return_value = ("OK", [b'"Borradores" (UIDVALIDITY 3 UIDNEXT 7 MESSAGES 2)'])
+            assert [draft["draft_id"] for draft in email_tools.fetch_draft_replies()] == ["5", "6"]
+            # Unchanged folder, no SEARCH nor FETCH
+            assert [draft["draft_id"] for draft in email_tools.fetch_draft_replies()] == ["5", "6"]
+            assert mock_conn.uid.call_count == 2
+
+            mock_conn.status.return_value = ("OK", [b'"Borradores" (UIDVALIDITY 3 UIDNEXT 8 MESSAGES 2)'])
+            assert [draft["draft_id"] for draft in email_tools.fetch_draft_replies()] == ["6", "7"]
+        assert mock_conn.uid.call_args_list[-1].args[:2] == ("FETCH", b"7")
+
+    def test_wait_for_new_emails_uses_idle(self, email_tools):
+        """Test that IDLE returns when the server announces new messages and is then ended."""
+        mock_conn = MagicMock()
+        mock_conn.capabilities = ("IMAP4REV1", "IDLE")
+        mock_conn._new_tag.return_value = b"A1"
+        mock_conn.readline.side_effect = [
+            b"+ idling\r\n", b"* 1 EXPUNGE\r\n", b"* 3 EXISTS\r\n", b"A1 OK IDLE terminated\r\n",
+        ]
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn):
+            assert email_tools.wait_for_new_emails(timeout=10)
+
+        assert [call.args[0] for call in mock_conn.send.call_args_list] == [b"A1 IDLE\r\n", b"DONE\r\n"]
+
+    def test_wait_for_new_emails_reads_pending_responses_before_idle(self, email_tools):
+        """Test that untagged responses sent before the IDLE continuation are read, EXISTS counting as new mail."""
+        mock_conn = MagicMock()
+        mock_conn.capabilities = ("IMAP4REV1", "IDLE")
+        mock_conn._new_tag.return_value = b"A1"
+        mock_conn.readline.side_effect = [
+            b"* 2 EXPUNGE\r\n", b"* 4 EXISTS\r\n", b"+ idling\r\n", b"A1 OK IDLE terminated\r\n",
+        ]
+        with patch.object(email_tools, "connect_to_inbox", return_value=mock_conn), \
+                patch("src.tools.EmailTools.time.sleep") as sleep:
+            assert email_tools.wait_for_new_emails(timeout=10)
+
+        sleep.assert_not_called()
+        mock_conn.shutdown.assert_not_called()
+        assert [call.args[0] for call in mock_conn.send.call_args_list] == [b"A1 IDLE\r\n", b"DONE\r\n"]
+
+    @patch('imaplib.IMAP4_SSL')
+    def test_imap_connection_is_reused(self, mock_imap, email_tools):
+        """Test that operations share one IMAP connection until it is closed."""
+        mock_conn = MagicMock()
+        mock_conn.select.return_value = ("OK", [b"1"])
+        mock_imap.return_value = mock_conn
+
+        with email_tools:
+            assert email_tools._get_imap() is mock_conn
+            assert email_tools._get_imap() is mock_conn
+            mock_imap.assert_called_once()
+            mock_conn.login.assert_called_once()
+        mock_conn.logout.assert_called_once()
+
+    @patch('src.tools.EmailTools.IMAP_POOL_SIZE', 1)
+    @patch('src.tools.EmailTools.IMAP_POOL_TIMEOUT', 0.01)
+    def test_imap_pool_replaces_broken_connections(self, email_tools):
+        """Test that broken pooled connections are closed and replaced, and waiting for a lease times out."""
+        broken, fresh = MagicMock(), MagicMock()
+        broken.select.side_effect = imaplib.IMAP4.abort("socket error")
+        with patch.object(email_tools, "connect_to_inbox", side_effect=[broken, fresh]):
+            with email_tools._lease_imap() as mail:
+                assert mail is broken
+                with pytest.raises(TimeoutError):
+                    with email_tools._lease_imap():
+                        pass
+            with email_tools._lease_imap() as mail:
+                assert mail is fresh
+        broken.shutdown.assert_called_once()
+
+    @patch('smtplib.SMTP')
+    def test_smtp_connection_is_reused(self, mock_smtp, email_tools):
+        """Test that replies share one SMTP session, reset between messages."""
+        mock_server = MagicMock()
+        mock_server.rset.return_value = (250, b"OK")
+        mock_server.send_message.return_value = {}
+        mock_smtp.return_value = mock_server
+        initial_email = {"sender": "ana@cliente.es", "subject": "Precio", "threadId": "t1", "messageId": "<m1@cliente.es>", "references": ""}
+
+        assert email_tools.send_reply(initial_email, "<p>Hola</p>")
+        assert email_tools.send_reply(initial_email, "<p>Hola otra vez</p>")
+
+        mock_smtp.assert_called_once_with('smtp.example.com', 587)
+        mock_server.login.assert_called_once()
+        mock_server.rset.assert_called_once()
+        assert mock_server.send_message.call_count == 2
+
+    @patch('src.tools.EmailTools.SMTP_POOL_SIZE', 2)
+    @patch('smtplib.SMTP')
+    def test_smtp_pool_replaces_idle_connections(self, mock_smtp, email_tools):
+        """Test that concurrent leases get their own connection and idle ones are replaced."""
+        mock_smtp.side_effect = lambda *args: MagicMock()
+        with email_tools._lease_smtp() as first, email_tools._lease_smtp() as second:
+            assert first is not second
+        assert mock_smtp.call_count == 2
+
+        with patch("src.tools.EmailTools.time.monotonic", return_value=time.monotonic() + 1000):
+            with email_tools._lease_smtp() as server:
+                assert server not in (first, second)
+        first.quit.assert_called_once()
+
+    @patch('src.tools.EmailTools.SMTP_POOL_SIZE', 1)
+    @patch('src.tools.EmailTools.SMTP_POOL_TIMEOUT', 0.01)
+    @patch('smtplib.SMTP')
+    def test_smtp_pool_wait_times_out(self, mock_smtp, email_tools):
+        """Test that waiting for a lease gives up when every pooled connection stays lent."""
+        with email_tools._lease_smtp():
+            with pytest.raises(TimeoutError):
+                with email_tools._lease_smtp():
+                    pass
+
+    def test_create_draft_reply_falls_back_to_imap_append(self, email_tools):
+        """Test that drafts are appended over IMAP when SMTP fails, reading their UID from APPENDUID."""
+        mock_conn = MagicMock()
+        mock_conn.append.return_value = ("OK", [b"[APPENDUID 1700000000 42] APPEND completed"])
+        email_tools._draft_folder = "Drafts"
+        initial_email = {"sender": "ana@cliente.es", "subject": "Precio", "threadId": "t1", "messageId": "<m1@cliente.es>", "references": ""}
+
+        with patch.object(email_tools, "_connect_smtp", side_effect=smtplib.SMTPException("down")), \
+                patch.object(email_tools, "_get_imap", return_value=mock_conn):
+            draft = email_tools.create_draft_reply(initial_email, "<p>Hola</p>")
+
+        assert draft["draft_id"] == "42"
+        assert mock_conn.append.call_args.args[:2] == ('"Drafts"', '(\\Draft)')
+        mock_conn.uid.assert_not_called()
+
+    def test_create_draft_reply_searches_appended_draft_by_message_id(self, email_tools):
+        """Test that without APPENDUID the draft is found by the Message-ID it was appended with."""
+        mock_conn = MagicMock()
+        mock_conn.append.return_value = ("OK", [b"APPEND completed"])
+        mock_conn.uid.return_value = ("OK", [b"42"])
+        email_tools._draft_folder = "Drafts"
+        initial_email = {"sender": "ana@cliente.es", "subject": "Precio", "threadId": "t1", "messageId": "", "references": ""}
+
+        with patch.object(email_tools, "_connect_smtp", side_effect=smtplib.SMTPException("down")), \
+                patch.object(email_tools, "_get_imap", return_value=mock_conn):
+            draft = email_tools.create_draft_reply(initial_email, "<p>Hola</p>")
+
+        appended = email.message_from_bytes(mock_conn.append.call_args.args[3])
+        assert draft["draft_id"] == "42"
+        assert appended["Message-ID"] == draft["id"]
+        assert mock_conn.uid.call_args.args == ("SEARCH", None, "HEADER", "Message-ID", f'"{draft["id"]}"')
+
+    def test_get_email_body_uses_part_charset(self, email_tools):
+        """Test that bodies are decoded with their declared charset."""
+        msg = MIMEMultipart("alternative")
+        msg.attach(MIMEText("<p>HTML</p>", "html"))
+        msg.attach(MIMEText("¿Cuánto cuesta?", "plain", "iso-8859-1"))
+        parsed = email.message_from_bytes(msg.as_bytes(), policy=email.policy.default)
+        assert email_tools._get_email_body(parsed) == "¿Cuánto cuesta?"
+
+    def test_extract_main_content_from_html(self, email_tools):
+        """Test that only the visible text of an HTML body is extracted."""
+        html = (
+            "<html><head><title>Oferta</title><style>p {color: red;}</style></head>"
+            "<body><p>Hola <b>Ana</b>,</p><script>track();</script><div>¿Precio?</div></body></html>"
+        )
+        assert email_tools._extract_main_content_from_html(html) == "Hola\nAna\n,\n¿Precio?"
+
 # Simple script to test actual connections
 def test_connections():
     """
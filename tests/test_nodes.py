@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+# Import the module to test
+from src.nodes import Nodes
+from src.state import Email
+from src.structure_outputs import EmailCategory
+
+
+class TestPrefilterCategory:
+    """Test suite for the heuristic email category prefilter."""
+
+    @pytest.mark.parametrize("sender", [
+        "promo@mail.mcsv.net",
+        "bounce-123@em.sendgrid.net",
+    ])
+    def test_bulk_senders_are_spam(self, sender):
+        """Test that senders of bulk-mail platforms are categorized as spam."""
+        assert Nodes._prefilter_category("Hello", "Offers", sender) == "spam"
+
+    def test_unsubscribe_footer_is_spam(self):
+        """Test that a newsletter footer marks the email as spam."""
+        body = "Great deals this week! Click here to unsubscribe."
+        assert Nodes._prefilter_category(body, "Deals", "shop@brand.com") == "spam"
+
+    def test_auto_reply_is_unrelated(self):
+        """Test that out-of-office replies are categorized as unrelated."""
+        assert Nodes._prefilter_category("I'm away", "Respuesta automática: Presupuesto", "ana@cliente.es") == "unrelated"
+
+    @pytest.mark.parametrize("subject", [
+        "[SPAM] Cheap watches",
+        "***SPAM*** Cheap watches",
+    ])
+    def test_spam_tag_is_spam(self, subject):
+        """Test that subjects tagged by a spam filter are categorized as spam."""
+        assert Nodes._prefilter_category("Hello", subject, "shop@brand.com") == "spam"
+
+    @pytest.mark.parametrize("subject", [
+        "Baja newsletter",
+        "Spam en mi formulario de contacto",
+        "spam filter issue",
+        "Auto-reply settings on your product?",
+        "Automatic reply configuration help",
+    ])
+    def test_customer_email_needs_llm(self, subject):
+        """Test that regular customer emails are left to the LLM, even when asking about spam or auto-replies."""
+        body = "Hola, quiero darme de baja del servicio de newsletter. ¿Cómo lo hago?"
+        assert Nodes._prefilter_category(body, subject, "ana@cliente.es") is None
+
+    @pytest.mark.parametrize("body", [
+        "Me interesa esta oferta, ¿tenéis stock?\n\n> Great deals this week! Click here to unsubscribe.",
+        "Me interesa esta oferta.\n\nEl lun, 3 mar 2025 a las 10:00, Shop <shop@brand.com> escribió:\n"
+        "Great deals this week! Click here to unsubscribe.",
+        "Me interesa esta oferta.\n-- \nAna\nYou are receiving this email because you are subscribed.",
+    ])
+    def test_quoted_footer_needs_llm(self, body):
+        """Test that footers in quoted emails or signatures don't make a customer reply spam."""
+        assert Nodes._prefilter_category(body, "Re: Deals", "ana@cliente.es") is None
+
+    def test_customer_newsletter_address_needs_llm(self):
+        """Test that a sender address alone does not make an email spam."""
+        assert Nodes._prefilter_category("Hola, quiero un presupuesto", "Presupuesto", "newsletter@cliente.es") is None
+
+
+class TestRetrieveFromRag:
+    """Test suite for the concurrent RAG retrieval node."""
+
+    @staticmethod
+    def _nodes(answers, delays):
+        """Builds Nodes with fake agents answering each query after a delay."""
+        calls = {"started": [], "finished": []}
+
+        async def generate(query):
+            calls["started"].append(query)
+            await asyncio.sleep(delays[query])
+            calls["finished"].append(query)
+            return answers[query]
+
+        cache = SimpleNamespace(alookup=AsyncMock(return_value=None), aupdate=AsyncMock())
+        nodes = Nodes.__new__(Nodes)
+        nodes.agents = SimpleNamespace(
+            rag_answer_cache=cache,
+            generate_rag_answer=SimpleNamespace(ainvoke=generate),
+        )
+        return nodes, calls
+
+    def test_answers_are_combined_in_query_order(self):
+        """Test that answers keep the order of their queries regardless of completion order."""
+        nodes, _ = self._nodes({"a": "1", "b": "2"}, {"a": 0.02, "b": 0})
+        result = asyncio.run(nodes.retrieve_from_rag({"rag_queries": ["a", "b"]}))
+        assert result == {"retrieved_documents": "a\n1\n\nb\n2\n\n", "needs_human_attention": False}
+
+    def test_null_answer_cancels_pending_queries(self):
+        """Test that a null answer flags human attention without waiting for the other queries."""
+        nodes, calls = self._nodes({"a": "null", "b": "2"}, {"a": 0, "b": 1})
+        result = asyncio.run(nodes.retrieve_from_rag({"rag_queries": ["a", "b"]}))
+        assert result == {"retrieved_documents": "", "needs_human_attention": True}
+        assert calls["started"] == ["a", "b"]
+        assert calls["finished"] == ["a"]
+
+
+class TestAnalyzeEmails:
+    """Test suite for the batched categorization and RAG query design node."""
+
+    @staticmethod
+    def _email(i, body):
+        return Email(id=str(i), threadId=f"t{i}", messageId=f"<m{i}@x>", references="",
+                     sender="ana@cliente.es", subject="Consulta", body=body)
+
+    def test_failed_llm_calls_leave_emails_to_a_human(self):
+        """Test that a failed call only affects its email, which is routed to human attention."""
+        calls = []
+
+        async def categorize(inputs, config=None, return_exceptions=False):
+            calls.append((config, return_exceptions))
+            return [
+                SimpleNamespace(category=EmailCategory.product_enquiry),
+                RuntimeError("429 Too Many Requests"),
+                SimpleNamespace(category=EmailCategory.product_enquiry),
+            ]
+
+        async def design(inputs, config=None, return_exceptions=False):
+            calls.append((config, return_exceptions))
+            return [SimpleNamespace(queries=["precio"]), SimpleNamespace(queries=["stock"]), RuntimeError("timeout")]
+
+        nodes = Nodes.__new__(Nodes)
+        nodes.agents = SimpleNamespace(
+            categorize_email=SimpleNamespace(abatch=categorize),
+            design_rag_queries=SimpleNamespace(abatch=design),
+        )
+        emails = [self._email(i, body) for i, body in enumerate(["¿Precio?", "¿Stock?", "¿Plazos?"])]
+        result = asyncio.run(nodes.analyze_emails({"emails": emails}))
+
+        assert [email.category for email in result["emails"]] == ["product_enquiry", "human_attention", "human_attention"]
+        assert result["emails"][0].rag_queries == ["precio"]
+        assert all(config["max_concurrency"] and return_exceptions for config, return_exceptions in calls)
+        assert Nodes.route_email_based_on_category(nodes, {"email_category": "human_attention"}) == "human attention"